@@ -1,15 +1,16 @@
 import pandas as pd
-import joblib
 import streamlit as st
-import os
-import tempfile
+from io import StringIO
 
 from datetime import datetime
-from utils.preprocessing import load_data, prepare_patient_view
+from utils.preprocessing import load_data, prepare_patient_view, load_cohort, population_summary
+from utils.ingest import read_dataset, IngestError
+from utils.visit_buffer import VisitBuffer
 from utils.prediction import run_predictions, forecast_next_visit
-from utils.risk import get_recommendation, trend_message, color_risk
-from utils.plot import plot_hb_dist, plot_hb_trend, plot_risk_trend, plot_forecast
-from utils.pdf_export import generate_pdf
+from utils.timeseries import patient_summary
+from utils.risk import recommendations, risk_styles, trend_message
+from utils.chart_cache import render_png
+from backend.scoring import load_kernel
 
 st.set_page_config(page_title="Anemia Detection App and Risk Monitoring" ,layout="wide")
 st.title("🩸 Anemia Detection • Risk Monitoring • Recommendations")
@@ -27,32 +28,48 @@ if username != "doctor" or password != "anemia123":
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("📂 Data input Method")
-mode = st.sidebar.radio("Choose data input method", ["Demo mode", "Upload CSV", "Manual Entry"])
+mode = st.sidebar.radio("Choose data input method", ["Demo mode", "Upload CSV", "Manual Entry", "Backend Cohort"])
 
 REQUIRED_FEATURES = ["Gender", "Hemoglobin", "MCH", "MCHC", "MCV"]
 data = None
+data_key = None
+index = None
 
 if mode == "Demo mode":
      try: 
           data = load_data("data/sample.csv")
+          data_key = "demo:data/sample.csv"
           st.info("🧪 Demo dataset loaded. Upload your own CSV to analyze real data")
      except FileNotFoundError:
           st.error("sample.csv missing.")
           st.stop()
 
 elif mode == "Upload CSV":
-     uploaded = st.sidebar.file_uploader("Upload CSV file",type=['csv'])
+     uploaded = st.sidebar.file_uploader("Upload CSV / Parquet / Feather file",type=['csv', 'gz', 'parquet', 'feather', 'arrow'])
      if uploaded:
-        data = pd.read_csv(uploaded)
+        data_key = f"upload:{uploaded.file_id}"
+        if st.session_state.get("upload_key") != data_key:
+             try:
+                  st.session_state.upload = read_dataset(uploaded, name=uploaded.name)
+             except IngestError as e:
+                  st.error(str(e))
+                  st.stop()
+             st.session_state.upload_key = data_key
+        data, bad_rows = st.session_state.upload
         st.success("File uploaded!")  
+        if len(bad_rows):
+             st.warning(f"Skipped {bad_rows.attrs.get('total', len(bad_rows))} invalid rows.")
+             with st.expander("Show skipped rows"):
+                  st.dataframe(bad_rows, use_container_width=True)
      else:
           st.warning("Upload a CSV to continue.")
           st.stop()    
 
 elif mode == "Manual Entry":
      st.subheader("📝 Enter Patient Data")
-     if "manual_data" not in st.session_state:
-          st.session_state.manual_data = pd.DataFrame(columns=["Patient_ID", "Date", "Gender", "Hemoglobin", "MCH", "MCHC", "MCV"])
+     if "visit_buffer" not in st.session_state:
+          st.session_state.visit_buffer = VisitBuffer()
+     buffer = st.session_state.visit_buffer
      pid = st.number_input("Patient ID", step=1, min_value=0)
      visit_date = st.date_input("Visit Date")
      gender = st.selectbox("Gender (0 = Female, 1 = Male)", [0, 1])
@@ -62,22 +79,77 @@ elif mode == "Manual Entry":
      mcv = st.number_input("MCV", format="%.1f")
 
      if st.button("Add Visit"):
-          new_row = pd.DataFrame([{
-               "Patient_ID":pid,
-               "Date":visit_date.strftime("%Y-%m-%d"),
-               "Gender":gender,
-               "Hemoglobin":hb,
-               "MCH":mch,
-               "MCHC":mchc,
-               "MCV":mcv,
-          }])
-
-          st.session_state.manual_data = pd.concat([st.session_state.manual_data, new_row], ignore_index=True)
+          buffer.append(pid, visit_date, gender, hb, mch, mchc, mcv)
+          st.success("✅ Visit added. Add more - or switch tabs to analyze.")
 
+     with st.expander("📋 Paste or append many visits"):
+          pasted = st.text_area("Paste CSV rows (with header: Patient_ID,Date,Gender,Hemoglobin,MCH,MCHC,MCV)")
+          if st.button("Add pasted visits") and pasted.strip():
+               try:
+                    added, bad_rows = buffer.extend(pd.read_csv(StringIO(pasted)))
+                    st.success(f"✅ Added {added} visits.")
+                    if len(bad_rows):
+                         st.warning(f"Skipped {len(bad_rows)} invalid rows.")
+                         st.dataframe(bad_rows, use_container_width=True)
+               except (ValueError, pd.errors.ParserError) as e:
+                    st.error(str(e))
+          appended = st.file_uploader("Append visits from CSV", type=["csv"], key="manual_append")
+          if appended and st.session_state.get("manual_append_id") != appended.file_id:
+               st.session_state.manual_append_id = appended.file_id
+               try:
+                    added, bad_rows = buffer.extend(pd.read_csv(appended))
+                    st.success(f"✅ Added {added} visits from {appended.name}.")
+                    if len(bad_rows):
+                         st.warning(f"Skipped {len(bad_rows)} invalid rows.")
+                         st.dataframe(bad_rows, use_container_width=True)
+               except (ValueError, pd.errors.ParserError) as e:
+                    st.error(str(e))
 
-          st.success("✅ Visit added. Add more - or switch tabs to analyze.")
+     data = buffer.to_frame()
+     data_key = f"manual:{buffer.version}"
+     index = buffer.patient_index()
 
-     data = st.session_state.manual_data
+elif mode == "Backend Cohort":
+     st.sidebar.caption("Stored visits streamed from the backend's /export endpoint")
+     id_text = st.sidebar.text_input("Patient IDs (comma-separated, blank = all)")
+     use_dates = st.sidebar.checkbox("Filter by visit date")
+     date_range = st.sidebar.date_input("Visit dates", value=()) if use_dates else ()
+     outcome = st.sidebar.selectbox("Stored prediction", ["All", "Anemic (1)", "Not anemic (0)"])
+     start = datetime.combine(date_range[0], datetime.min.time()) if len(date_range) > 0 else None
+     end = datetime.combine(date_range[-1], datetime.max.time()) if len(date_range) > 0 else None
+     with st.expander("📊 Population overview (all stored visits)", expanded="cohort" not in st.session_state):
+          col_period, col_split = st.columns(2)
+          period = col_period.radio("Period", ["month", "day"], horizontal=True, format_func=str.title)
+          split = col_split.radio("Split visits by", ["risk_band", "gender"], horizontal=True,
+                                  format_func=lambda c: c.replace("_", " ").title())
+          try:
+               from utils.plot import plot_population_trend
+               plot_population_trend(population_summary(period, split, start, end),
+                                     population_summary(period, "", start, end), split)
+          except Exception as e:
+               st.warning(f"Could not load population summary: {e}")
+     if st.sidebar.button("Load cohort"):
+          try:
+               ids = [int(p) for p in id_text.replace(" ", "").split(",") if p]
+          except ValueError:
+               st.error("Patient IDs must be whole numbers separated by commas.")
+               st.stop()
+          prediction = {"All": None, "Anemic (1)": 1, "Not anemic (0)": 0}[outcome]
+          with st.spinner("Streaming cohort from backend..."):
+               try:
+                    st.session_state.cohort = load_cohort(ids, start, end, prediction)
+               except Exception as e:
+                    st.error(f"Could not load cohort: {e}")
+                    st.stop()
+          st.session_state.cohort_key = f"cohort:{datetime.now().isoformat()}"
+     if "cohort" not in st.session_state:
+          st.info("Choose filters and press **Load cohort**.")
+          st.stop()
+     data, bad_rows = st.session_state.cohort
+     data_key = st.session_state.cohort_key
+     st.success(f"Loaded {len(data)} visits for {data['Patient_ID'].nunique()} patients from the backend.")
+     if len(bad_rows):
+          st.warning(f"Skipped {bad_rows.attrs.get('total', len(bad_rows))} invalid rows.")
 
 if data is None or data.empty:
      st.warning("No data to display yet.")
@@ -87,21 +159,32 @@ if data.empty and mode != "Manual Entry":
      st.warning("No data to display yet.")
      st.stop()
 
-filtered_df, has_date, has_patient  = prepare_patient_view(data)
+filtered_df, has_date, has_patient  = prepare_patient_view(data, data_key, index)
 
 @st.cache_resource
 def load_model():
-    return joblib.load("model/anemia_model.pkl")
+    try:
+        return load_kernel()
+    except Exception:
+        return None
 
 model = load_model()
 
+# plotting and PDF export are imported here rather than at the top,
+# so the login page and empty-data reruns don't pay for plotly or ReportLab
+from utils.plot import plot_hb_dist, plot_hb_trend, plot_risk_trend, plot_forecast
+
 @st.cache_data
-def cached_predictions(df, _model, features):
-     return run_predictions(df, _model, features)
+def cached_pdf(results, patient_id, chart_png):
+     from utils.pdf_export import generate_pdf
+     return generate_pdf(results, patient_id=patient_id, chart_png=chart_png)
 
 @st.cache_data
-def cached_pdf(results, patient_id, chart_path):
-     return generate_pdf(results, patient_id=patient_id, chart_path=chart_path)
+def cached_patient_reports(results):
+     from utils.pdf_export import generate_patient_reports_zip
+     # st.download_button serves bytes, so the finished archive is read back once here
+     with generate_patient_reports_zip(results) as archive:
+          return archive.read()
 
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
      "📊 Overview",
@@ -120,20 +203,21 @@ with tab1:
 
 with tab2:
      st.header("🧠 Anemia Predictions")
-     results = cached_predictions(filtered_df, model, REQUIRED_FEATURES)
-     results["Date"] = pd.to_datetime(filtered_df["Date"].values)
-     if has_patient:
-          results["Patient_ID"] = filtered_df["Patient_ID"].astype("Int64").values
-     if has_patient:
-          results = results.sort_values(
-          by=["Patient_ID", "Date"],
-          key=lambda col: col.astype("int64") if col.name == "Patient_ID" else col
-          )
+     # scores are cached per row (see backend.cache), so reruns only score new or edited visits
+     results = run_predictions(filtered_df, model, REQUIRED_FEATURES)
+     if not pd.api.types.is_datetime64_any_dtype(results["Date"]):
+          results["Date"] = pd.to_datetime(results["Date"], errors="coerce")
      
-     results["Recommendation"] = results.apply(lambda r: get_recommendation(r["Risk Probability (%)"], r["Hemoglobin"]), axis=1)
+     results["Recommendation"] = recommendations(results["Risk Probability (%)"].to_numpy(), results["Hemoglobin"].to_numpy())
 
      st.subheader("📋 Patient Risk Table")
-     st.dataframe(results.style.applymap(color_risk, subset=["Risk Probability (%)"]), use_container_width=True)
+     page_size = st.selectbox("Rows per page", [25, 50, 100, 500], index=1)
+     n_pages = max(1, -(-len(results) // page_size))
+     page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1) if n_pages > 1 else 1
+     # only the visible page is styled, so render cost does not grow with the upload size
+     visible = results.iloc[(page - 1) * page_size: page * page_size]
+     st.dataframe(visible.style.apply(risk_styles, subset=["Risk Probability (%)"]), use_container_width=True)
+     st.caption(f"Page {page} of {n_pages} • {len(results)} rows")
 
      csv = results.to_csv(index=False).encode("utf-8")
      st.download_button(
@@ -150,30 +234,54 @@ with tab3:
           plot_risk_trend(results, filtered_df, has_date)
  
 
+multi_patient = has_patient and results["Patient_ID"].nunique() > 1
+summary = patient_summary(results) if has_patient and has_date else None
+
 with tab4:
      st.subheader("Risk Forecast (Next Visit)")
      if not has_date or len(filtered_df) < 2:
           st.info("Add at least 2 dated records to see trends.")
-     else:
-          future_prob, future_preds = forecast_next_visit(results, filtered_df, model)
-          fig = plot_forecast(results, filtered_df, future_prob, future_preds, has_date)
-          tmp_dir = tempfile.gettempdir()
-          chart_path = os.path.join(tmp_dir, "risk_chart.png")
-          if fig is not None:
-               fig.write_image(chart_path)
-          pdf_buffer = cached_pdf(results, patient_id=filtered_df["Patient_ID"].iloc[0] if has_patient else None, chart_path=chart_path)
+     elif multi_patient:
+          st.subheader("🔮 Predicted Next-Visit Risk by Patient")
+          st.dataframe(summary, use_container_width=True)
+          pdf_buffer = cached_pdf(results, patient_id=None, chart_png=None)
           st.download_button(
           label="📄 Download PDF Report", data=pdf_buffer, file_name="anemia_report.pdf", mime="application/pdf"
           )
-          st.subheader("🔮 Predicted Next-Visit Risk")
-          st.markdown(f"""
-                      ### **{future_prob:.1f}%**
-                       _Risk estimate based on current trend_
-                      """)
+          if st.button("🗂️ Build per-patient reports (ZIP)"):
+               st.session_state.reports_zip = cached_patient_reports(results)
+          if "reports_zip" in st.session_state:
+               st.download_button(
+               label="⬇️ Download per-patient reports (ZIP)", data=st.session_state.reports_zip, file_name="anemia_reports.zip", mime="application/zip"
+               )
+     else:
+          future_prob, future_preds = forecast_next_visit(results, filtered_df, model)
+          if future_prob is None:
+               st.info("Need at least 3 visits to forecast risk.")
+          else:
+               fig = plot_forecast(results, filtered_df, future_prob, future_preds, has_date)
+               chart_png = None
+               if fig is not None:
+                    try:
+                         chart_png = render_png(fig)
+                    except Exception as e:
+                         st.warning(f"Chart could not be rendered for the PDF: {e}")
+               pdf_buffer = cached_pdf(results, patient_id=filtered_df["Patient_ID"].iloc[0] if has_patient else None, chart_png=chart_png)
+               st.download_button(
+               label="📄 Download PDF Report", data=pdf_buffer, file_name="anemia_report.pdf", mime="application/pdf"
+               )
+               st.subheader("🔮 Predicted Next-Visit Risk")
+               st.markdown(f"""
+                           ### **{future_prob:.1f}%**
+                            _Risk estimate based on current trend_
+                           """)
 
 with tab5:
      st.subheader("Clinical-style Interpretation")   
-     if has_patient:
+     if multi_patient:
+          st.write(summary["Trend"].value_counts().rename("Patients"))
+          st.dataframe(summary[["Patient_ID", "Trend Message"]], use_container_width=True, hide_index=True)
+     elif has_patient:
           st.write(trend_message(filtered_df["Hemoglobin"]))    
      else:
           st.info("Select a patient to view individualized interpretation")       
@@ -0,0 +1,97 @@
+import os
+import time
+import asyncio
+from .telemetry import BATCH_SIZE, ERRORS
+
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "3"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "256"))
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.queue = None
+        self.task = None
+        # requests taken off the queue that have not been handed their result yet
+        self.batch = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        # a batch already in the model was finished by _run; anything collected or queued after that never ran
+        leftovers = self.batch + [self.queue.get_nowait() for _ in range(self.queue.qsize())]
+        for _, fut, _, _ in leftovers:
+            if not fut.done():
+                fut.set_exception(RuntimeError("Prediction queue shut down"))
+        self.batch = []
+        self.task = None
+
+    async def submit(self, item, timings=None):
+        # if given, timings receives "queue" and "inference" durations in seconds
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, fut, timings, time.perf_counter()))
+        return await fut
+
+    async def _collect(self):
+        # collected into self.batch so stop() can fail requests caught mid-collection
+        self.batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(self.batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                self.batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return self.batch
+
+    def _resolve(self, batch, work, started):
+        error = work.exception()
+        if error is not None:
+            ERRORS.inc(stage="predict")
+            for _, fut, _, _ in batch:
+                if not fut.done():
+                    fut.set_exception(error)
+            return
+        finished = time.perf_counter()
+        for (_, fut, timings, enqueued), result in zip(batch, work.result()):
+            if timings is not None:
+                timings["queue"] = started - enqueued
+                timings["inference"] = finished - started
+            if not fut.done():
+                fut.set_result(result)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _, _, _ in batch]
+            BATCH_SIZE.observe(len(items), stage="predict")
+            started = time.perf_counter()
+            work = loop.run_in_executor(None, self.predict_fn, items)
+            try:
+                await asyncio.shield(work)
+            except asyncio.CancelledError:
+                # stop() arrived mid-batch; the executor thread keeps going, so let it finish and
+                # hand out its results before shutting down
+                await asyncio.wait([work])
+                self._resolve(batch, work, started)
+                self.batch = []
+                raise
+            except Exception:
+                pass
+            self._resolve(batch, work, started)
+            self.batch = []
@@ -0,0 +1,109 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "100000"))
+PREDICTION_CACHE_DB = os.getenv("PREDICTION_CACHE_DB")
+KEY_DECIMALS = 4
+MISSING = -1e9
+SQLITE_BATCH = 500
+
+
+def feature_keys(X, model_version):
+    # rounding makes float32 uploads and float64 API payloads share entries; NaN gets a sentinel
+    # because NaN never compares equal inside a tuple
+    X = np.round(np.asarray(X, dtype=float), KEY_DECIMALS)
+    X = np.where(np.isnan(X), MISSING, X)
+    return [tuple(row) + (model_version,) for row in X.tolist()]
+
+
+class PredictionCache:
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, db_path=PREDICTION_CACHE_DB):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS prediction_cache (key TEXT PRIMARY KEY, probability REAL)")
+            self.db.commit()
+
+    def _disk_get(self, keys):
+        found = {}
+        encoded = {json.dumps(k): k for k in keys}
+        names = list(encoded)
+        for start in range(0, len(names), SQLITE_BATCH):
+            chunk = names[start:start + SQLITE_BATCH]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.db.execute(f"SELECT key, probability FROM prediction_cache WHERE key IN ({placeholders})", chunk)
+            for name, probability in rows:
+                found[encoded[name]] = probability
+        return found
+
+    def get_many(self, keys):
+        values = [None] * len(keys)
+        missing = []
+        with self.lock:
+            for i, key in enumerate(keys):
+                value = self.entries.get(key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self.entries.move_to_end(key)
+                    values[i] = value
+            if missing and self.db is not None:
+                found = self._disk_get({keys[i] for i in missing})
+                still_missing = []
+                for i in missing:
+                    if keys[i] in found:
+                        values[i] = found[keys[i]]
+                        self._remember(keys[i], values[i])
+                    else:
+                        still_missing.append(i)
+                missing = still_missing
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return values, missing
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def put_many(self, keys, values):
+        with self.lock:
+            for key, value in zip(keys, values):
+                self._remember(key, float(value))
+            if self.db is not None:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO prediction_cache (key, probability) VALUES (?, ?)",
+                    [(json.dumps(k), float(v)) for k, v in zip(keys, values)],
+                )
+                self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM prediction_cache")
+                self.db.commit()
+
+
+def cached_scores(cache, X, score, model_version):
+    # score(X) is only called for rows that are not cached yet
+    X = np.asarray(X, dtype=float)
+    keys = feature_keys(X, model_version)
+    values, missing = cache.get_many(keys)
+    if missing:
+        fresh = score(X[missing])
+        cache.put_many([keys[i] for i in missing], fresh)
+        for i, v in zip(missing, fresh):
+            values[i] = float(v)
+    return np.asarray(values, dtype=float)
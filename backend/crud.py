@@ -1,5 +1,14 @@
+import csv
+import io
+from datetime import datetime
+from sqlalchemy import or_, and_, insert, select
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, rollups
+from .telemetry import DB_COMMIT_LATENCY
+
+EXPORT_BATCH_SIZE = 5000
+BULK_COLUMNS = ["patient_id", "Gender", "Hemoglobin", "MCH", "MCHC", "MCV", "prediction", "probability", "date",
+                "model_version"]
 
 def save_record(db: Session, data: schemas.AnemiaInput, pred:  dict):
     record = models.RiskRecord(
@@ -12,6 +21,7 @@ def save_record(db: Session, data: schemas.AnemiaInput, pred:  dict):
         prediction = pred["prediction"],
         probability = pred["probability"],
         date = data.date,
+        model_version = pred.get("model_version"),
     )
 
     db.add(record)
@@ -20,8 +30,109 @@ def save_record(db: Session, data: schemas.AnemiaInput, pred:  dict):
     return record
 
 
-def get_records_by_patient(db: Session, patient_id: int):
-    return(
-        db.query(models.RiskRecord).filter(models.RiskRecord.patient_id==patient_id).
-        order_by(models.RiskRecord.date).all()
-    )
\ No newline at end of file
+def save_records(db: Session, data: list[schemas.AnemiaInput], preds: list[dict]):
+    records = [
+        models.RiskRecord(
+            patient_id = d.patient_id,
+            Gender = d.Gender,
+            Hemoglobin = d.Hemoglobin,
+            MCH = d.MCH,
+            MCHC = d.MCHC,
+            MCV = d.MCV,
+            prediction = p["prediction"],
+            probability = p["probability"],
+            date = d.date,
+            model_version = p.get("model_version"),
+        )
+        for d, p in zip(data, preds)
+    ]
+    with DB_COMMIT_LATENCY.time(op="save"):
+        db.add_all(records)
+        db.flush()
+        ids = [r.id for r in records]
+        rollups.apply(db, [(r.date, r.Gender, r.probability, r.Hemoglobin) for r in records])
+        db.commit()
+    return ids
+
+
+def get_patient_page(db: Session, patient_id: int, fields: list[str], limit: int,
+                     after_date=None, after_id=None, start=None, end=None):
+    R = models.RiskRecord
+    # id and date are always selected because the keyset cursor is built from them
+    columns = [R.id, R.date] + [getattr(R, f) for f in fields if f not in ("id", "date")]
+    query = db.query(*columns).filter(R.patient_id == patient_id)
+    if start is not None:
+        query = query.filter(R.date >= start)
+    if end is not None:
+        query = query.filter(R.date <= end)
+    # Dated visits come first in (date, id) order, then undated ones by id. A cursor with an id but
+    # no date points into the undated tail.
+    in_undated_tail = after_date is None and after_id is not None
+    rows = []
+    if not in_undated_tail:
+        dated = query.filter(R.date.isnot(None))
+        if after_date is not None:
+            if after_id is None:
+                dated = dated.filter(R.date > after_date)
+            else:
+                dated = dated.filter(or_(R.date > after_date, and_(R.date == after_date, R.id > after_id)))
+        rows = dated.order_by(R.date, R.id).limit(limit).all()
+    if len(rows) == limit or start is not None or end is not None:
+        return rows
+    undated = query.filter(R.date.is_(None))
+    if in_undated_tail:
+        undated = undated.filter(R.id > after_id)
+    return rows + undated.order_by(R.id).limit(limit - len(rows)).all()
+
+
+def stream_records(db: Session, fields: list[str], patient_ids=None, start=None, end=None, prediction=None,
+                   batch_size=EXPORT_BATCH_SIZE):
+    # yield_per streams through a server-side cursor where the driver has one, so only one batch is in memory
+    R = models.RiskRecord
+    query = select(*[getattr(R, f) for f in fields])
+    if patient_ids:
+        query = query.where(R.patient_id.in_(patient_ids))
+    if start is not None:
+        query = query.where(R.date >= start)
+    if end is not None:
+        query = query.where(R.date <= end)
+    if prediction is not None:
+        query = query.where(R.prediction == prediction)
+    query = query.order_by(R.patient_id, R.date, R.id).execution_options(yield_per=batch_size)
+    for rows in db.execute(query).partitions():
+        yield [tuple(row) for row in rows]
+
+
+def _copy_records(db: Session, rows: list[dict]):
+    created_at = datetime.utcnow()
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    for row in rows:
+        w.writerow(["" if row.get(c) is None else row[c] for c in BULK_COLUMNS] + [created_at])
+    buf.seek(0)
+    columns = ", ".join(f'"{c}"' for c in BULK_COLUMNS + ["created_at"])
+    sql = f"COPY {models.RiskRecord.__tablename__} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    cursor = db.connection().connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(sql, buf)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buf.getvalue())
+    finally:
+        cursor.close()
+
+
+def bulk_insert_records(db: Session, rows: list[dict]):
+    if not rows:
+        return 0
+    with DB_COMMIT_LATENCY.time(op="bulk"):
+        if db.get_bind().dialect.name == "postgresql":
+            _copy_records(db, rows)
+        else:
+            db.execute(insert(models.RiskRecord), [{c: row.get(c) for c in BULK_COLUMNS} for row in rows])
+        rollups.apply(db, [(row.get("date"), row.get("Gender"), row.get("probability"), row.get("Hemoglobin"))
+                           for row in rows])
+        db.commit()
+    return len(rows)
\ No newline at end of file
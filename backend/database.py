@@ -1,10 +1,84 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///./anemia.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./anemia.db")
+# pg_advisory_lock key that serialises init_db across workers
+MIGRATION_LOCK_KEY = 72_616_101
+# Railway/Heroku hand out postgres:// URLs, SQLAlchemy only accepts postgresql://
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread":False})
+def engine_options(url):
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.close()
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def _already_exists(error):
+    message = str(error.orig).lower()
+    return "already exists" in message or "duplicate column" in message
+
+
+def _schema_step(conn, run):
+    # each DDL statement in its own transaction; losing a race to another worker is not an error
+    if conn.in_transaction():
+        conn.commit()
+    try:
+        with conn.begin():
+            run()
+    except (OperationalError, ProgrammingError) as e:
+        if not _already_exists(e):
+            raise
+
+
+def init_db():
+    # Creates missing tables, then adds indexes and nullable columns introduced after a table was
+    # created. Every uvicorn worker and the offline loaders call it, so it is idempotent, and on
+    # PostgreSQL the callers take turns on an advisory lock.
+    from . import models  # noqa: F401  registers the tables on Base
+    with engine.connect() as conn:
+        locked = conn.dialect.name == "postgresql"
+        if locked:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            for table in Base.metadata.sorted_tables:
+                _schema_step(conn, lambda: table.create(conn, checkfirst=True))
+                for index in table.indexes:
+                    _schema_step(conn, lambda: index.create(conn, checkfirst=True))
+                existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing and column.nullable:
+                        ddl = f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column.type.compile(conn.dialect)}'
+                        _schema_step(conn, lambda: conn.execute(text(ddl)))
+        finally:
+            if locked:
+                if conn.in_transaction():
+                    conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                conn.commit()
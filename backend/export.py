@@ -0,0 +1,89 @@
+import io
+import csv
+import json
+import importlib.util
+from datetime import datetime, date
+from . import models
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def format_available(fmt):
+    return fmt != "parquet" or importlib.util.find_spec("pyarrow") is not None
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value)}")
+
+
+def ndjson_chunks(batches, fields):
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(fields, row)), default=_json_default) + "\n" for row in rows).encode()
+
+
+def csv_chunks(batches, fields):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    # write-only stream for ParquetWriter; bytes are handed out per row group instead of kept
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _arrow_schema(fields):
+    import pyarrow as pa
+    types = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp("us")}
+    columns = models.RiskRecord.__table__.columns
+    return pa.schema([(f, types[columns[f].type.python_type]) for f in fields])
+
+
+def parquet_chunks(batches, fields):
+    # one row group per database batch
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = _arrow_schema(fields)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in batches:
+        columns = list(zip(*rows))
+        writer.write_table(pa.table([pa.array(c, type=t) for c, t in zip(columns, schema.types)], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def encode(fmt, batches, fields):
+    return {"ndjson": ndjson_chunks, "csv": csv_chunks, "parquet": parquet_chunks}[fmt](batches, fields)
@@ -0,0 +1,76 @@
+import argparse
+import pandas as pd
+from utils.ingest import iter_dataset, IngestError
+from .database import SessionLocal, init_db
+from .scoring import calibrate, FEATURES
+from .registry import active_version, resolve
+from . import crud
+
+CSV_COLUMNS = {"Patient_ID": "patient_id", "Date": "date"}
+INT_COLUMNS = ["patient_id", "Gender", "prediction"]
+
+
+def score_frame(df: pd.DataFrame, kernel):
+    return calibrate(kernel.predict_proba(df[FEATURES].to_numpy(dtype=float))[:, 1])
+
+
+def frame_to_rows(df: pd.DataFrame, kernel):
+    df = df.rename(columns=CSV_COLUMNS)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    if "model_version" not in df.columns:
+        df["model_version"] = None
+    if "probability" not in df.columns or df["probability"].isna().any():
+        proba = score_frame(df, kernel)
+        if "probability" in df.columns:
+            missing = df["probability"].isna().to_numpy()
+            df.loc[missing, "probability"] = proba[missing]
+            df.loc[missing, "model_version"] = kernel.version
+        else:
+            df["probability"] = proba
+            df["model_version"] = kernel.version
+    # every row without a stored prediction gets one from its (stored or fresh) probability
+    derived = (df["probability"] >= 50).astype(int)
+    if "prediction" in df.columns:
+        derived = pd.to_numeric(df["prediction"], errors="coerce").fillna(derived).astype(int)
+    df["prediction"] = derived
+    # float-typed ids or genders would reach COPY as "1.0", which Postgres rejects for integer columns
+    for col in INT_COLUMNS:
+        df[col] = pd.to_numeric(df[col]).astype("Int64")
+
+    out = df[crud.BULK_COLUMNS].astype(object)
+    return out.where(pd.notna(out), None).to_dict("records")
+
+
+def ingest_csv(path, chunksize=50000, rejects=None):
+    # rows go through the same validation as score_batch: nullable ints, and invalid rows are
+    # reported instead of failing the import halfway through
+    init_db()
+    kernel = resolve(active_version())
+    total = n_bad = 0
+    reports = []
+    db = SessionLocal()
+    try:
+        for clean, report in iter_dataset(path, chunksize=chunksize):
+            missing = [c for c in CSV_COLUMNS if c not in clean.columns]
+            if missing:
+                raise IngestError(f"Missing required columns: {missing}")
+            total += crud.bulk_insert_records(db, frame_to_rows(clean, kernel))
+            n_bad += len(report)
+            if rejects and len(report):
+                reports.append(report)
+            print(f"Inserted {total} rows, skipped {n_bad}")
+    finally:
+        db.close()
+    if rejects:
+        (pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=["row", "reason"])) \
+            .to_csv(rejects, index=False)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load historical visits into risk_records")
+    parser.add_argument("path")
+    parser.add_argument("--chunksize", type=int, default=50000)
+    parser.add_argument("--rejects", help="write skipped rows (row number + reason) to this CSV")
+    args = parser.parse_args()
+    ingest_csv(args.path, args.chunksize, args.rejects)
@@ -1,11 +1,73 @@
-from fastapi import FastAPI, Depends
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Header, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from .database import Base, engine, SessionLocal
-from . import models, schemas, services, crud
+from .database import SessionLocal, init_db
+from .batching import MicroBatcher
+from .writer import RecordWriter
+from .registry import ModelArtifactError, ModelVersionError, WEB_CONCURRENCY, list_versions
+from .export import EXPORT_FORMATS, encode, format_available
+from .telemetry import REQUEST_LATENCY, ERRORS, setup_logging, stop_logging, render_metrics, server_timing
+from . import models, schemas, services, crud, rollups
 
-Base.metadata.create_all(bind=engine)
+setup_logging()
 
-app = FastAPI(title="Anemia Risk API")
+HISTORY_FIELDS = list(schemas.RiskRecords.model_fields)
+DEFAULT_HISTORY_FIELDS = ["id", "patient_id", "probability", "prediction", "date"]
+MAX_PAGE_SIZE = 1000
+# admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+batcher = MicroBatcher(services.run_batch_prediction)
+writer = RecordWriter()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema setup runs at startup, not import, so importing the app never touches the database;
+    # it and the model prewarm are independent, so run them side by side
+    await asyncio.gather(asyncio.to_thread(init_db), asyncio.to_thread(services.registry.start))
+    writer.start()
+    await batcher.start()
+    yield
+    await batcher.stop()
+    writer.stop()
+    services.registry.stop()
+    stop_logging()
+
+app = FastAPI(title="Anemia Risk API", lifespan=lifespan)
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    except Exception:
+        ERRORS.inc(stage="http")
+        raise
+    finally:
+        # label by route template, not raw path, so /patient/{patient_id} stays one series
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(time.perf_counter() - start, method=request.method,
+                                route=route.path if route is not None else "unmatched", status=status)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def parse_fields(fields, default):
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else default
+    unknown = [f for f in selected if f not in HISTORY_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {unknown}")
+    return selected
 
 def get_db():
     db = SessionLocal()
@@ -20,16 +82,114 @@ def home():
     }
 
 @app.post("/predict")
-def predict(input_data:schemas.AnemiaInput,  db: Session = Depends(get_db)):
-    result = services.run_prediction(input_data)
-    saved = crud.save_record(db, input_data, result)
-    return {"result": result, "record_id": saved.id}
+async def predict(input_data:schemas.AnemiaInput, response: Response):
+    start = time.perf_counter()
+    timings = {}
+    result = await batcher.submit(input_data, timings)
+    scored = time.perf_counter()
+    record_id = await asyncio.wrap_future(writer.submit(input_data, result))
+    timings["write"] = time.perf_counter() - scored
+    timings["total"] = time.perf_counter() - start
+    response.headers["Server-Timing"] = server_timing(timings)
+    return {"result": result, "record_id": record_id}
+
+@app.post("/predict/batch")
+def predict_batch(input_data: list[schemas.AnemiaInput], db: Session = Depends(get_db)):
+    results = services.run_batch_prediction(input_data)
+    record_ids = crud.save_records(db, input_data, results)
+    return {"results": results, "record_ids": record_ids}
+
+@app.get("/patient/{patient_id}", response_model=schemas.RiskRecordPage)
+def get_history(patient_id: int,
+                limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                after_date: Optional[datetime] = None,
+                after_id: Optional[int] = None,
+                start: Optional[datetime] = None,
+                end: Optional[datetime] = None,
+                fields: Optional[str] = None,
+                db: Session = Depends(get_db)):
+    selected = parse_fields(fields, DEFAULT_HISTORY_FIELDS)
+
+    rows = crud.get_patient_page(db, patient_id, selected, limit, after_date, after_id, start, end)
+    records = [
+        schemas.RiskRecords.model_validate({**row._mapping, "patient_id": patient_id}).model_dump(include=set(selected))
+        for row in rows
+    ]
+    page = schemas.RiskRecordPage(records=records)
+    if len(rows) == limit:
+        page.next_after_date = rows[-1].date
+        page.next_after_id = rows[-1].id
+    return page
+
+@app.get("/export", dependencies=[Depends(require_admin)])
+def export(format: str = "ndjson",
+           patient_ids: Optional[str] = None,
+           start: Optional[datetime] = None,
+           end: Optional[datetime] = None,
+           prediction: Optional[int] = Query(None, ge=0, le=1),
+           fields: Optional[str] = None):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"Unknown format '{format}', expected one of {list(EXPORT_FORMATS)}")
+    if not format_available(format):
+        raise HTTPException(status_code=422, detail="Parquet export needs pyarrow installed on the server")
+    selected = parse_fields(fields, HISTORY_FIELDS)
+    try:
+        ids = [int(p) for p in patient_ids.split(",") if p.strip()] if patient_ids else None
+    except ValueError:
+        raise HTTPException(status_code=422, detail="patient_ids must be comma-separated integers")
+
+    def body():
+        # the session lives as long as the stream, not the request handler
+        db = SessionLocal()
+        try:
+            batches = crud.stream_records(db, selected, ids, start, end, prediction)
+            yield from encode(format, batches, selected)
+        finally:
+            db.close()
+
+    return StreamingResponse(body(), media_type=EXPORT_FORMATS[format],
+                             headers={"Content-Disposition": f'attachment; filename="risk_records.{format}"'})
+
+@app.get("/cohort/summary")
+def cohort_summary(period: str = "month",
+                   start: Optional[datetime] = None,
+                   end: Optional[datetime] = None,
+                   by: Optional[str] = ",".join(rollups.GROUP_COLUMNS),
+                   db: Session = Depends(get_db)):
+    # reads only the rollup table, so cost depends on the date range, not on how many visits are stored
+    if period not in rollups.PERIODS:
+        raise HTTPException(status_code=422, detail=f"Unknown period '{period}', expected one of {list(rollups.PERIODS)}")
+    group_by = [c.strip() for c in by.split(",") if c.strip()] if by else []
+    unknown = [c for c in group_by if c not in rollups.GROUP_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown group columns: {unknown}")
+    return {"period": period, "by": group_by, "rows": rollups.summarize(db, period, start, end, group_by)}
+
+@app.get("/admin/model", dependencies=[Depends(require_admin)])
+def model_info():
+    return {**services.registry.info(), "versions": list_versions(services.registry.registry_dir)}
+
+@app.post("/admin/model/reload", dependencies=[Depends(require_admin)])
+def reload_model(version: Optional[str] = None):
+    # runs in the threadpool; requests already holding the old kernel finish on it
+    # a version that fails to load or validate is rejected and the current kernel keeps serving
+    try:
+        info = services.registry.activate(version)
+    except ModelArtifactError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ModelVersionError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if WEB_CONCURRENCY > 1:
+        # only this worker swapped; the others read the CURRENT pointer on their own schedule
+        watch = services.registry.watch_seconds
+        info["scope"] = (f"this worker only; the other {WEB_CONCURRENCY - 1} follow CURRENT within {watch:g}s" if watch > 0
+                         else f"this worker only; the other {WEB_CONCURRENCY - 1} keep their model until they restart")
+    return info
 
-@app.get("/patient/{patient_id}")
-def get_history(patient_id: int, db: Session = Depends(get_db)):
-    records = crud.get_records_by_patient(db, patient_id)
-    return records
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 def health():
-    return{"status": "ok"}
\ No newline at end of file
+    return{"status": "ok", "model_version": services.registry.current().version}
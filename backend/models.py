@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, UniqueConstraint
 from .database import Base
 from datetime import datetime
 
@@ -15,4 +15,29 @@ class RiskRecord(Base):
     prediction = Column(Integer)
     probability = Column(Float)
     date = Column(DateTime)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    model_version = Column(String(32))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_risk_records_patient_date", "patient_id", "date"),
+    )
+
+
+class CohortRollup(Base):
+    # Additive aggregates of risk_records per day/month, gender and 1-point probability bin.
+    # Every column besides the key is a sum, so inserts can be folded in with one upsert.
+    __tablename__ = "cohort_rollups"
+
+    id = Column(Integer, primary_key=True)
+    period = Column(String(5), nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    gender = Column(Integer, nullable=False)
+    risk_band = Column(String(10), nullable=False)
+    prob_bin = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    prob_sum = Column(Float, nullable=False, default=0.0)
+    low_hb = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("period", "period_start", "gender", "risk_band", "prob_bin", name="uq_cohort_rollups_key"),
+    )
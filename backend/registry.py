@@ -0,0 +1,195 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+import numpy as np
+from .scoring import BASE_DIR, FEATURES, ScoringKernel, load_kernel
+from .telemetry import log_event
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(BASE_DIR, "model", "registry"))
+CURRENT_FILE = "CURRENT"
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# seconds between checks of the CURRENT pointer; 0 disables the file watch. A reload only reaches the
+# worker that handled it, so with several workers the others follow the pointer by default
+MODEL_WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "5" if WEB_CONCURRENCY > 1 else "0"))
+
+
+class ModelVersionError(ValueError):
+    pass
+
+
+class ModelArtifactError(ModelVersionError):
+    # the version exists but its artifact cannot be served (corrupt, partial or wrong features)
+    pass
+
+
+def artifact_path(version, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, f"{version}.json")
+
+
+def pipeline_path(version, registry_dir=REGISTRY_DIR):
+    # the sklearn pipeline a kernel was folded from, kept next to it for retraining and audits
+    return os.path.join(registry_dir, f"{version}.pkl")
+
+
+def _atomic_write(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def publish(kernel, metadata=None, activate=False, registry_dir=REGISTRY_DIR):
+    # artifacts are immutable and named by the kernel version, which is a checksum of the weights
+    os.makedirs(registry_dir, exist_ok=True)
+    path = artifact_path(kernel.version, registry_dir)
+    if not os.path.exists(path):
+        spec = {
+            "version": kernel.version,
+            "features": kernel.features,
+            "medians": kernel.medians.tolist(),
+            "weights": kernel.weights.tolist(),
+            "intercept": kernel.intercept,
+            "metadata": {"published_at": datetime.utcnow().isoformat(timespec="seconds"), **(metadata or {})},
+        }
+        _atomic_write(path, json.dumps(spec, indent=2, default=str))
+    if activate:
+        _atomic_write(os.path.join(registry_dir, CURRENT_FILE), kernel.version + "\n")
+    return kernel.version
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    versions = []
+    for name in sorted(os.listdir(registry_dir)):
+        if not name.endswith(".json"):
+            continue
+        # the filename is what reload and CURRENT refer to; the stored field is only checked against it
+        version = name[:-len(".json")]
+        try:
+            with open(os.path.join(registry_dir, name)) as f:
+                spec = json.load(f)
+            entry = {**spec.get("metadata", {}), "version": version}
+            if spec.get("version") != version:
+                entry["error"] = f"artifact records version {spec.get('version')!r}"
+            versions.append(entry)
+        except (OSError, ValueError, AttributeError) as e:
+            versions.append({"version": version, "error": repr(e)})
+    return versions
+
+
+def load_version(version, registry_dir=REGISTRY_DIR):
+    path = artifact_path(version, registry_dir)
+    if not os.path.exists(path):
+        raise ModelVersionError(f"Unknown model version: {version}")
+    try:
+        kernel = ScoringKernel.load(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise ModelArtifactError(f"Cannot read model version {version}: {e!r}") from e
+    if kernel.version != version:
+        raise ModelArtifactError(f"Checksum mismatch for {version}: artifact hashes to {kernel.version}")
+    return kernel
+
+
+def validate(kernel):
+    # the API builds rows in FEATURES order; one scored row also prewarms the kernel before it serves
+    if kernel.features != FEATURES:
+        raise ModelArtifactError(f"Model {kernel.version} expects {kernel.features}, the API sends {FEATURES}")
+    try:
+        proba = kernel.predict_proba([kernel.medians])
+    except (ValueError, TypeError) as e:
+        raise ModelArtifactError(f"Model {kernel.version} cannot score: {e!r}") from e
+    if proba.shape != (1, 2) or not np.all(np.isfinite(proba)):
+        raise ModelArtifactError(f"Model {kernel.version} returned invalid probabilities")
+    return kernel
+
+
+def resolve(version, registry_dir=REGISTRY_DIR):
+    # version=None means no registry yet: the kernel shipped in model/
+    return validate(load_kernel() if version is None else load_version(version, registry_dir))
+
+
+def active_version(registry_dir=REGISTRY_DIR):
+    path = os.path.join(registry_dir, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+class ModelRegistry:
+    # Holds the kernel used for scoring. Callers take one reference per request via current(),
+    # so a swap only affects requests that start after it; in-flight ones finish on the old kernel.
+    def __init__(self, registry_dir=REGISTRY_DIR, watch_seconds=MODEL_WATCH_SECONDS):
+        self.registry_dir = registry_dir
+        self.watch_seconds = watch_seconds
+        self.kernel = None
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def current(self):
+        kernel = self.kernel
+        if kernel is None:
+            with self.lock:
+                if self.kernel is None:
+                    self._swap(self._load(active_version(self.registry_dir)))
+                kernel = self.kernel
+        return kernel
+
+    def _load(self, version):
+        return resolve(version, self.registry_dir)
+
+    def _swap(self, kernel):
+        self.kernel = kernel
+        self.loaded_at = datetime.utcnow()
+        log_event(logger, "model_loaded", version=kernel.version, features=kernel.features)
+
+    def activate(self, version=None):
+        # version=None re-reads the CURRENT pointer; otherwise the pointer is moved so other workers follow
+        with self.lock:
+            # any failure here leaves self.kernel (and the CURRENT pointer) untouched
+            if version is not None:
+                kernel = self._load(version)
+                _atomic_write(os.path.join(self.registry_dir, CURRENT_FILE), version + "\n")
+            else:
+                kernel = self._load(active_version(self.registry_dir))
+            if self.kernel is None or kernel.version != self.kernel.version:
+                self._swap(kernel)
+        return self.info()
+
+    def info(self):
+        kernel = self.current()
+        return {
+            "version": kernel.version,
+            "loaded_at": self.loaded_at.isoformat(timespec="seconds"),
+            "active": active_version(self.registry_dir),
+        }
+
+    def start(self):
+        self.current()
+        if self.watch_seconds > 0 and self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._watch, name="model-watch", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def _watch(self):
+        while not self.stop_event.wait(self.watch_seconds):
+            version = active_version(self.registry_dir)
+            if version is None or version == self.kernel.version:
+                continue
+            try:
+                self.activate()
+            except (OSError, ValueError, KeyError):
+                logger.exception("model_reload_failed", extra={"fields": {"version": version}})
@@ -0,0 +1,179 @@
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select, text
+from utils.risk import RISK_THRESHOLDS
+from .database import SessionLocal, init_db
+from . import models
+
+PERIODS = ("day", "month")
+GROUP_COLUMNS = ("gender", "risk_band")
+ROLLUP_KEYS = ["period", "period_start", "gender", "risk_band", "prob_bin"]
+SUM_COLUMNS = ["count", "prob_sum", "low_hb"]
+# risk bands use the dashboard's high/moderate cut-offs
+HIGH_RISK = RISK_THRESHOLDS["high"]
+MODERATE_RISK = RISK_THRESHOLDS["moderate"]
+# the "Hb < 12" share, the same line as the Hb trend chart (RISK_THRESHOLDS["low_hb"] = 11 drives recommendations)
+LOW_HB = 12.0
+UNKNOWN_GENDER = -1
+REBUILD_BATCH_SIZE = 5000
+
+
+def risk_band(probability):
+    if probability >= HIGH_RISK:
+        return "high"
+    if probability >= MODERATE_RISK:
+        return "moderate"
+    return "low"
+
+
+def period_start(period, when):
+    if period == "month":
+        return datetime(when.year, when.month, 1)
+    return datetime(when.year, when.month, when.day)
+
+
+def accumulate(acc, rows):
+    # rows are (date, gender, probability, hemoglobin); undated or unscored rows are left out
+    for when, gender, probability, hb in rows:
+        if when is None or probability is None or probability != probability:
+            continue
+        probability = float(probability)
+        prob_bin = min(max(int(probability // 1), 0), 100)
+        band = risk_band(probability)
+        g = UNKNOWN_GENDER if gender is None else int(gender)
+        low = 1 if hb is not None and hb < LOW_HB else 0
+        for period in PERIODS:
+            start = period_start(period, when)
+            entry = acc.get((period, start, g, band, prob_bin))
+            if entry is None:
+                acc[(period, start, g, band, prob_bin)] = [1, probability, low]
+            else:
+                entry[0] += 1
+                entry[1] += probability
+                entry[2] += low
+    return acc
+
+
+def _records(acc):
+    # sorted so concurrent upserts take row locks in the same order
+    return [dict(zip(ROLLUP_KEYS, key), **dict(zip(SUM_COLUMNS, sums))) for key, sums in sorted(acc.items())]
+
+
+def _upsert(db, records):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # no portable upsert; such databases rely on `python -m backend.rollups`
+        return
+    table = models.CohortRollup.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=ROLLUP_KEYS,
+        set_={c: table.c[c] + stmt.excluded[c] for c in SUM_COLUMNS},
+    )
+    db.execute(stmt, records)
+
+
+def apply(db, rows):
+    # called inside the insert transaction, so records and rollups commit (or roll back) together
+    records = _records(accumulate({}, rows))
+    if records:
+        _upsert(db, records)
+
+
+def rebuild(db, since=None, until=None):
+    # Compaction/backfill: recompute whole months from risk_records and replace their rollups.
+    # The rollup table stays locked from the delete to the commit, so concurrent inserts wait in
+    # rollups.apply and add their counts afterwards instead of being double-counted or lost:
+    # PostgreSQL takes an explicit EXCLUSIVE lock (reads still go through), SQLite's single
+    # writer lock does the same once the delete runs. Run it off-peak.
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"LOCK TABLE {models.CohortRollup.__tablename__} IN EXCLUSIVE MODE"))
+    since = period_start("month", since) if since else None
+    if until:
+        nxt = period_start("month", until) + timedelta(days=32)
+        until = period_start("month", nxt) - timedelta(microseconds=1)
+    R = models.CohortRollup
+    query = delete(R)
+    if since:
+        query = query.where(R.period_start >= since)
+    if until:
+        query = query.where(R.period_start <= until)
+    db.execute(query)
+
+    RR = models.RiskRecord
+    source = select(RR.date, RR.Gender, RR.probability, RR.Hemoglobin)
+    if since:
+        source = source.where(RR.date >= since)
+    if until:
+        source = source.where(RR.date <= until)
+    acc = {}
+    for rows in db.execute(source.execution_options(yield_per=REBUILD_BATCH_SIZE)).partitions():
+        accumulate(acc, rows)
+    records = _records(acc)
+    # the range was just emptied under the lock, so plain inserts work on every dialect
+    for i in range(0, len(records), REBUILD_BATCH_SIZE):
+        db.execute(insert(models.CohortRollup), records[i:i + REBUILD_BATCH_SIZE])
+    db.commit()
+    return len(records)
+
+
+def _p90(bins, count):
+    # linear interpolation inside the 1-point bin that crosses the 90th percentile
+    target = 0.9 * count
+    seen = 0
+    for prob_bin in sorted(bins):
+        n = bins[prob_bin]
+        if seen + n >= target:
+            return round(prob_bin + (target - seen) / n, 2)
+        seen += n
+    return None
+
+
+def summarize(db, period="month", start=None, end=None, group_by=GROUP_COLUMNS):
+    R = models.CohortRollup
+    query = select(R.period_start, *[getattr(R, c) for c in group_by], R.prob_bin, R.count, R.prob_sum, R.low_hb) \
+        .where(R.period == period)
+    if start is not None:
+        # the period containing start is included, not just periods that begin after it
+        query = query.where(R.period_start >= period_start(period, start))
+    if end is not None:
+        query = query.where(R.period_start <= end)
+
+    groups = {}
+    for row in db.execute(query):
+        key = tuple(row[:1 + len(group_by)])
+        prob_bin, count, prob_sum, low_hb = row[1 + len(group_by):]
+        g = groups.setdefault(key, {"bins": {}, "count": 0, "prob_sum": 0.0, "low_hb": 0})
+        g["bins"][prob_bin] = g["bins"].get(prob_bin, 0) + count
+        g["count"] += count
+        g["prob_sum"] += prob_sum
+        g["low_hb"] += low_hb
+
+    out = []
+    for key in sorted(groups):
+        g = groups[key]
+        out.append({
+            **dict(zip(["period_start", *group_by], key)),
+            "count": g["count"],
+            "mean_probability": round(g["prob_sum"] / g["count"], 2),
+            "p90_probability": _p90(g["bins"], g["count"]),
+            "low_hb_share": round(g["low_hb"] / g["count"], 4),
+        })
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild cohort rollups from risk_records (backfill / compaction)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="first month to rebuild (default: all)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="last month to rebuild (default: all)")
+    args = parser.parse_args()
+    init_db()
+    db = SessionLocal()
+    try:
+        print(f"Wrote {rebuild(db, args.since, args.until)} rollup rows")
+    finally:
+        db.close()
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime, date
+from typing import Optional
 
 class AnemiaInput(BaseModel):
     patient_id: int
@@ -11,11 +12,23 @@ class AnemiaInput(BaseModel):
     date: date
 
 class RiskRecords(BaseModel):
-    id : int
-    patient_id: int
-    probability: int
-    prediction: int
-    date: datetime
+    id : Optional[int] = None
+    patient_id: Optional[int] = None
+    probability: Optional[float] = None
+    prediction: Optional[int] = None
+    date: Optional[datetime] = None
+    Gender: Optional[int] = None
+    Hemoglobin: Optional[float] = None
+    MCH: Optional[float] = None
+    MCHC: Optional[float] = None
+    MCV: Optional[float] = None
+    model_version: Optional[str] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class RiskRecordPage(BaseModel):
+    records: list[dict]
+    # pass both back as after_date / after_id; a null date with an id continues through undated visits
+    next_after_date: Optional[datetime] = None
+    next_after_id: Optional[int] = None
\ No newline at end of file
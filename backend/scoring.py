@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(BASE_DIR, "model", "anemia_model.pkl")
+KERNEL_PATH = os.path.join(BASE_DIR, "model", "anemia_kernel.json")
+FEATURES = ["Gender", "Hemoglobin", "MCH", "MCHC", "MCV"]
+
+def calibrate(raw_proba):
+    proba = 20 + 0.6 * (np.asarray(raw_proba, dtype=float) * 100)
+    return np.round(np.clip(proba, 5, 95), 2)
+
+
+class ScoringKernel:
+    # Imputer -> StandardScaler -> LogisticRegression folded into one linear model:
+    # logit = x @ (coef / scale) + (intercept - coef @ (mean / scale)), NaNs replaced by medians.
+    def __init__(self, features, medians, weights, intercept):
+        self.features = list(features)
+        self.medians = np.asarray(medians, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.intercept = float(intercept)
+        spec = json.dumps([self.features, self.medians.tolist(), self.weights.tolist(), self.intercept])
+        self.version = hashlib.sha256(spec.encode("utf-8")).hexdigest()[:12]
+        # sha256 of the pickled pipeline this kernel was exported from, when known
+        self.pipeline_sha256 = None
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        imputer = pipeline.named_steps["impute"]
+        scaler = pipeline.named_steps["scaler"]
+        lr = pipeline.named_steps["model"]
+        weights = lr.coef_[0] / scaler.scale_
+        intercept = lr.intercept_[0] - np.dot(weights, scaler.mean_)
+        medians = np.asarray(imputer.statistics_, dtype=float)
+        # column order comes from what the pipeline was fit on; FEATURES is only a fallback for array-fit models
+        features = list(getattr(pipeline, "feature_names_in_", getattr(imputer, "feature_names_in_", FEATURES)))
+        if sorted(features) == sorted(FEATURES) and features != FEATURES:
+            # same columns in another order: permute so callers can keep passing X[FEATURES]
+            order = [features.index(name) for name in FEATURES]
+            features, medians, weights = FEATURES, medians[order], weights[order]
+        return cls(features, medians, weights, intercept)
+
+    @classmethod
+    def load(cls, path=KERNEL_PATH):
+        with open(path) as f:
+            spec = json.load(f)
+        kernel = cls(spec["features"], spec["medians"], spec["weights"], spec["intercept"])
+        kernel.pipeline_sha256 = spec.get("pipeline_sha256")
+        return kernel
+
+    def save(self, path=KERNEL_PATH, model_path=None):
+        spec = {
+            "features": self.features,
+            "medians": self.medians.tolist(),
+            "weights": self.weights.tolist(),
+            "intercept": self.intercept,
+        }
+        if model_path is not None:
+            spec["pipeline_sha256"] = file_sha256(model_path)
+        with open(path, "w") as f:
+            json.dump(spec, f, indent=2)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        X = np.where(np.isnan(X), self.medians, X)
+        z = X @ self.weights + self.intercept
+        p = np.exp(-np.logaddexp(0, -z))
+        return np.column_stack([1 - p, p])
+
+    def __repr__(self):
+        return f"ScoringKernel(version={self.version}, features={self.features})"
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_kernel(path=KERNEL_PATH, model_path=MODEL_PATH):
+    # the kernel records which pickle it came from, so a pipeline replaced by hand is folded again;
+    # mtimes can't tell, a fresh checkout writes the files in any order
+    if os.path.exists(path):
+        kernel = ScoringKernel.load(path)
+        if kernel.pipeline_sha256 is None or not os.path.exists(model_path) \
+                or file_sha256(model_path) == kernel.pipeline_sha256:
+            return kernel
+    import joblib
+    return ScoringKernel.from_pipeline(joblib.load(model_path))
+
+
+def check_parity(pipeline, kernel, X, atol=1e-9):
+    names = getattr(pipeline, "feature_names_in_", None)
+    expected = pipeline.predict_proba(X if names is None else X[list(names)])[:, 1]
+    actual = kernel.predict_proba(X if names is None else X[kernel.features])[:, 1]
+    return float(np.max(np.abs(expected - actual))) <= atol
+
+
+if __name__ == "__main__":
+    import joblib
+    import pandas as pd
+
+    pipeline = joblib.load(MODEL_PATH)
+    kernel = ScoringKernel.from_pipeline(pipeline)
+    X = pd.read_csv(os.path.join(BASE_DIR, "data", "sample.csv"))[FEATURES]
+    if not check_parity(pipeline, kernel, X):
+        print("Kernel does not match pipeline output, not exported.")
+        sys.exit(1)
+    kernel.save(model_path=MODEL_PATH)
+    print("Exported scoring kernel to", KERNEL_PATH)
@@ -1,24 +1,36 @@
-import os
-import joblib
+import time
+import logging
 import numpy as np
 from . import schemas
+from .scoring import calibrate
+from .registry import ModelRegistry
+from .cache import PredictionCache, cached_scores
+from .telemetry import INFERENCE_LATENCY, FunctionCounter, log_sampled
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, "model", "anemia_model.pkl")
+logger = logging.getLogger(__name__)
+registry = ModelRegistry()
+cache = PredictionCache()
+FunctionCounter("anemia_prediction_cache_hits_total", "Rows served from the prediction cache", lambda: cache.hits)
+FunctionCounter("anemia_prediction_cache_misses_total", "Rows scored by the model", lambda: cache.misses)
+
+def scores_for(kernel, X):
+    # the kernel is resolved once per call, so a hot-swap never mixes versions within a request
+    def score(X):
+        with INFERENCE_LATENCY.time():
+            return calibrate(kernel.predict_proba(X)[:, 1])
+    return cached_scores(cache, X, score, kernel.version)
 
-model = joblib.load(MODEL_PATH) 
-print("Loaded model:", model)
 def run_prediction(data: schemas.AnemiaInput):
     X = np.array([[data.Gender, data.Hemoglobin, data.MCH, data.MCHC, data.MCV]])
-    print("Input X:", X)
-    proba_array = model.predict_proba(X)
-    print("predict_proba output:", proba_array)
-    raw_proba = model.predict_proba(X)[0][1] * 100
-    proba = 20 + 0.6 * raw_proba
-    proba = max(5, min(95, proba))
+    kernel = registry.current()
+    start = time.perf_counter()
+    proba = float(scores_for(kernel, X)[0])
     preds = int(proba >= 50)
+    # operational fields only: no patient IDs, labs or scores in the logs
+    log_sampled(logger, "prediction", rows=1, model_version=kernel.version,
+                duration_ms=round((time.perf_counter() - start) * 1000, 3))
     return{
-        "probability": round(proba, 2),
+        "probability": proba,
         "prediction": preds,
         "gender": data.Gender,
         "hemoglobin":data.Hemoglobin,
@@ -26,7 +38,33 @@ def run_prediction(data: schemas.AnemiaInput):
         "mchc":data.MCHC,
         "mcv":data.MCV,
         "patient_id":data.patient_id,
-        "date":data.date
+        "date":data.date,
+        "model_version": kernel.version
     }    
 
+def run_batch_prediction(records: list[schemas.AnemiaInput]):
+    if not records:
+        return []
+    X = np.array([[r.Gender, r.Hemoglobin, r.MCH, r.MCHC, r.MCV] for r in records], dtype=float)
+    kernel = registry.current()
+    start = time.perf_counter()
+    proba = scores_for(kernel, X)
+    preds = (proba >= 50).astype(int)
+    log_sampled(logger, "batch_prediction", rows=len(records), model_version=kernel.version,
+                duration_ms=round((time.perf_counter() - start) * 1000, 3))
+    return [
+        {
+            "probability": float(p),
+            "prediction": int(y),
+            "gender": r.Gender,
+            "hemoglobin": r.Hemoglobin,
+            "mch": r.MCH,
+            "mchc": r.MCHC,
+            "mcv": r.MCV,
+            "patient_id": r.patient_id,
+            "date": r.date,
+            "model_version": kernel.version
+        }
+        for r, p, y in zip(records, proba, preds)
+    ]
 
@@ -0,0 +1,93 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from .database import SessionLocal
+from .telemetry import BATCH_SIZE, ERRORS
+from . import crud
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+WRITE_FLUSH_MS = float(os.getenv("WRITE_FLUSH_MS", "10"))
+
+_STOP = object()
+
+
+class RecordWriter:
+    # Write-behind for RiskRecord inserts: callers get a Future for their record id,
+    # a single thread commits everything queued within WRITE_FLUSH_MS in one transaction.
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, flush_ms=WRITE_FLUSH_MS, session_factory=SessionLocal):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.session_factory = session_factory
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="record-writer", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
+
+    def submit(self, data, pred) -> Future:
+        fut = Future()
+        self.queue.put((data, pred, fut))
+        return fut
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _flush(self, batch):
+        BATCH_SIZE.observe(len(batch), stage="write")
+        db = self.session_factory()
+        try:
+            ids = crud.save_records(db, [b[0] for b in batch], [b[1] for b in batch])
+        except Exception as e:
+            ERRORS.inc(stage="write")
+            db.rollback()
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        finally:
+            db.close()
+        for (_, _, fut), record_id in zip(batch, ids):
+            fut.set_result(record_id)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            self._flush(batch)
+        # drain whatever is still queued so shutdown never drops an accepted prediction
+        pending = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                pending.append(item)
+        for start in range(0, len(pending), self.batch_size):
+            self._flush(pending[start:start + self.batch_size])
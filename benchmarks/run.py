@@ -0,0 +1,325 @@
+import argparse
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from benchmarks.synthetic import BASE_DIR, make_visits, parse_size
+
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmarks", "baseline.json")
+BENCHES = ("imports", "single_row", "http", "ingest", "pipeline", "pdf", "plots")
+IMPORT_MODULES = ("backend.main", "utils.preprocessing", "utils.prediction", "utils.plot", "utils.pdf_export")
+PDF_ROWS = (100, 1_000, 5_000)
+DEFAULT_TOLERANCE = 0.25
+# metrics checked against the baseline: True if higher is better. p99 and means are reported only,
+# they are too noisy at these repeat counts to gate on.
+GATED_METRICS = {"p50_ms": False, "requests_per_s": True}
+
+
+def summarize(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        "n": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+def timed(fn, repeat, warmup=1):
+    # warmup calls (i < 0) pay for lazy imports and first-use caches and are not recorded
+    for i in range(-warmup, 0):
+        fn(i)
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def quiet_streamlit():
+    # the dashboard helpers run outside `streamlit run` here; silence the bare-mode warnings
+    from streamlit import config, logger
+    config.set_option("global.showWarningOnDirectExecution", False)
+    config.set_option("logger.level", "error")
+    logger.set_log_level("error")
+
+
+def import_profile(module):
+    # fresh interpreter per run; -X importtime reports microseconds per module on stderr
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=BASE_DIR,
+                          capture_output=True, text=True, check=True)
+    total, children = 0.0, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == module and not name.startswith("  "):
+            total = int(cumulative) / 1e6
+        elif name.startswith("   ") and not name.startswith("    "):
+            children.append((name.strip(), int(cumulative) / 1000))
+    return total, sorted(children, key=lambda c: -c[1])[:5]
+
+
+def bench_imports(args):
+    results = {}
+    for module in IMPORT_MODULES:
+        profiles = [import_profile(module) for _ in range(args.repeat)]
+        results[f"imports.{module}"] = {
+            **summarize([total for total, _ in profiles]),
+            "heaviest_ms": [[name, round(ms, 1)] for name, ms in profiles[-1][1]],
+        }
+    return results
+
+
+def random_inputs(n, seed=0):
+    visits = make_visits(n, seed=seed)
+    visits["Date"] = visits["Date"].dt.strftime("%Y-%m-%d")
+    return visits.rename(columns={"Patient_ID": "patient_id", "Date": "date"}).drop(columns="Result") \
+                 .to_dict("records")
+
+
+def bench_single_row(args):
+    from backend import schemas, services
+    inputs = [schemas.AnemiaInput(**r) for r in random_inputs(args.single_row_n)]
+    services.registry.current()
+    services.cache.clear()
+    miss = timed(lambda i: services.run_prediction(inputs[i]), len(inputs), warmup=0)
+    hit = timed(lambda i: services.run_prediction(inputs[i]), len(inputs), warmup=0)
+    return {"single_row.miss": miss, "single_row.hit": hit}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url, proc, timeout=60):
+    import urllib3
+    http = urllib3.PoolManager()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if http.request("GET", url, timeout=1, retries=False).status == 200:
+                return
+        except urllib3.exceptions.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not up after {timeout}s")
+
+
+def _client(url, bodies, latencies, errors):
+    import urllib3
+    http = urllib3.PoolManager(maxsize=1)
+    for body in bodies:
+        start = time.perf_counter()
+        try:
+            r = http.request("POST", url, body=body, headers={"Content-Type": "application/json"},
+                             timeout=30, retries=False)
+            ok = r.status == 200
+        except urllib3.exceptions.HTTPError:
+            ok = False
+        latencies.append(time.perf_counter() - start)
+        if not ok:
+            errors.append(1)
+
+
+def bench_http(args):
+    # /predict against a local uvicorn with a throwaway SQLite database, N clients in parallel
+    results = {}
+    port = _free_port()
+    tmp = tempfile.mkdtemp(prefix="anemia-bench-")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}"}
+    env.pop("PREDICTION_CACHE_DB", None)
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_up(f"http://127.0.0.1:{port}/health", proc)
+        url = f"http://127.0.0.1:{port}/predict"
+        for clients in args.clients:
+            bodies = [json.dumps(r).encode() for r in random_inputs(clients * args.requests, seed=clients)]
+            latencies, errors = [], []
+            threads = [threading.Thread(target=_client, args=(url, bodies[i::clients], latencies, errors))
+                       for i in range(clients)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            results[f"http.predict.c{clients}"] = {
+                **summarize(latencies),
+                "requests_per_s": round(len(latencies) / elapsed, 1),
+                "errors": len(errors),
+            }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return results
+
+
+def bench_ingest(args):
+    from utils.ingest import read_dataset
+    results = {}
+    for size in args.sizes:
+        buf = io.BytesIO()
+        make_visits(parse_size(size)).to_csv(buf, index=False, date_format="%Y-%m-%d")
+        data = buf.getvalue()
+        results[f"ingest.csv.{size}"] = timed(lambda i: read_dataset(io.BytesIO(data), "visits.csv"), args.repeat)
+    return results
+
+
+def typed_visits(n):
+    from utils.ingest import clean_chunk
+    return clean_chunk(make_visits(n))[0]
+
+
+def bench_pipeline(args):
+    # Tab 2 + Tab 4 of the dashboard: patient view, local predictions, cohort summary and one forecast.
+    # Each repeat uses a fresh data key and an empty prediction cache, i.e. a first render.
+    quiet_streamlit()
+    from backend.scoring import load_kernel
+    from utils.preprocessing import prepare_patient_view
+    from utils.prediction import run_predictions, forecast_next_visit, prediction_cache, REQUIRED_FEATURES
+    from utils.timeseries import patient_summary
+    model = load_kernel()
+    results = {}
+    for size in args.sizes:
+        data = typed_visits(parse_size(size))
+        first = data["Patient_ID"].iloc[0]
+
+        def run(i):
+            prediction_cache().clear()
+            view, _, _ = prepare_patient_view(data, data_key=f"bench:{size}:{i}")
+            scored = run_predictions(view, model, REQUIRED_FEATURES, mode="local")
+            patient_summary(scored)
+            forecast_next_visit(scored[scored["Patient_ID"] == first], view, model)
+
+        results[f"pipeline.{size}"] = timed(run, args.repeat)
+    return results
+
+
+def bench_pdf(args):
+    quiet_streamlit()
+    from backend.scoring import load_kernel
+    from utils.prediction import run_predictions, REQUIRED_FEATURES
+    from utils.pdf_export import generate_pdf
+    scored = run_predictions(typed_visits(max(PDF_ROWS)), load_kernel(), REQUIRED_FEATURES, mode="local")
+    return {f"pdf.rows{n}": timed(lambda i: generate_pdf(scored.head(n)), args.repeat) for n in PDF_ROWS}
+
+
+def bench_plots(args):
+    # figure build plus st.plotly_chart serialization (a no-op render outside `streamlit run`)
+    quiet_streamlit()
+    from backend.scoring import load_kernel
+    from utils.prediction import run_predictions, forecast_next_visit, REQUIRED_FEATURES
+    from utils.plot import plot_hb_dist, plot_hb_trend, plot_risk_trend, plot_forecast
+    model = load_kernel()
+    results = {}
+    for size in args.sizes:
+        data = typed_visits(parse_size(size))
+        scored = run_predictions(data, model, REQUIRED_FEATURES, mode="local")
+        one = scored[scored["Patient_ID"] == scored["Patient_ID"].iloc[0]]
+        future_prob, future_date = forecast_next_visit(one, one, model)
+        results[f"plots.hb_dist.{size}"] = timed(lambda i: plot_hb_dist(data), args.repeat)
+        results[f"plots.hb_trend.{size}"] = timed(lambda i: plot_hb_trend(data, True), args.repeat)
+        results[f"plots.risk_trend.{size}"] = timed(lambda i: plot_risk_trend(scored, data, True), args.repeat)
+        results[f"plots.forecast.{size}"] = timed(
+            lambda i: plot_forecast(one, one, future_prob, future_date, True), args.repeat)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get("results", {}).get(name, {})
+        for metric, higher_is_better in GATED_METRICS.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            if (new < old * (1 - tolerance)) if higher_is_better else (new > old * (1 + tolerance)):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend, dashboard pipeline and reports")
+    parser.add_argument("--only", help=f"comma-separated subset of {','.join(BENCHES)}")
+    parser.add_argument("--sizes", default="1k,100k", help="dataset sizes: 1k, 100k, 1M or row counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--single-row-n", type=int, default=2000, help="calls per single_row case")
+    parser.add_argument("--clients", default="1,8,32", help="concurrent /predict clients per run")
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+    args.sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    args.clients = [int(c) for c in args.clients.split(",")]
+
+    selected = args.only.split(",") if args.only else BENCHES
+    unknown = [b for b in selected if b not in BENCHES]
+    if unknown:
+        parser.error(f"unknown benchmarks: {unknown}")
+
+    results = {}
+    for name in selected:
+        print(f"Running {name} ...", file=sys.stderr)
+        results.update(globals()[f"bench_{name}"](args))
+    report = {"environment": environment(), "results": results}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(text + "\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old} -> {new}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
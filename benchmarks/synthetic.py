@@ -0,0 +1,60 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PATH = os.path.join(BASE_DIR, "data", "sample.csv")
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+VISIT_DAYS = 30
+
+
+def parse_size(size):
+    if size in SIZES:
+        return SIZES[size]
+    return int(size)
+
+
+def make_visits(n_visits, visits_per_patient=5, seed=0, template=SAMPLE_PATH):
+    # Each synthetic patient starts from a random visit in the sample, then drifts by a
+    # per-patient Hb trend plus noise; MCH/MCHC/MCV follow Hb so the labs stay plausible.
+    rng = np.random.default_rng(seed)
+    sample = pd.read_csv(template).dropna(how="all")
+    n_patients = -(-n_visits // visits_per_patient)
+    patient = np.arange(n_visits) // visits_per_patient
+    visit_no = np.arange(n_visits) % visits_per_patient
+
+    base = sample.iloc[rng.integers(0, len(sample), n_patients)].reset_index(drop=True)
+    drift = (rng.normal(0, 0.4, n_patients)[patient] * visit_no)
+    hb = base["Hemoglobin"].to_numpy()[patient] + drift + rng.normal(0, 0.2, n_visits)
+
+    start = np.datetime64("2023-01-01") + rng.integers(0, 365, n_patients).astype("timedelta64[D]")
+    offsets = (visit_no * VISIT_DAYS + rng.integers(-3, 4, n_visits)).astype("timedelta64[D]")
+
+    df = pd.DataFrame({
+        "Patient_ID": patient + 1,
+        "Date": start[patient] + offsets,
+        "Gender": base["Gender"].to_numpy()[patient],
+        "Hemoglobin": np.round(np.clip(hb, 5, 18), 1),
+        "MCH": np.round(base["MCH"].to_numpy()[patient] + 0.8 * drift + rng.normal(0, 0.3, n_visits), 1),
+        "MCHC": np.round(base["MCHC"].to_numpy()[patient] + 0.6 * drift + rng.normal(0, 0.3, n_visits), 1),
+        "MCV": np.round(base["MCV"].to_numpy()[patient] + 2.5 * drift + rng.normal(0, 1.0, n_visits), 1),
+    })
+    df["Result"] = (df["Hemoglobin"] < 11.5).astype(int)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic visits file shaped like data/sample.csv")
+    parser.add_argument("size", help="1k, 100k, 1M or a row count")
+    parser.add_argument("output", help="output .csv, .csv.gz or .parquet")
+    parser.add_argument("--visits-per-patient", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = make_visits(parse_size(args.size), args.visits_per_patient, args.seed)
+    if args.output.endswith(".parquet"):
+        df.to_parquet(args.output, index=False)
+    else:
+        df.to_csv(args.output, index=False, date_format="%Y-%m-%d")
+    print(f"Wrote {len(df)} visits for {df['Patient_ID'].nunique()} patients to {args.output}")
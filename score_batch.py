@@ -0,0 +1,134 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from backend.scoring import calibrate, FEATURES
+from backend.registry import active_version, resolve
+from utils.ingest import iter_chunks, clean_chunk, detect_format
+from utils.risk import recommendations
+
+RISK_COL = "Risk Probability (%)"
+DB_COLUMNS = ["Patient_ID", "Date"]
+
+_kernel = None
+
+def _init_worker(version=None):
+    global _kernel
+    _kernel = resolve(version)
+
+def score_chunk(args):
+    chunk, offset = args
+    clean, bad_rows = clean_chunk(chunk, offset)
+    proba = calibrate(_kernel.predict_proba(clean[FEATURES].to_numpy(dtype=float))[:, 1])
+    clean[RISK_COL] = proba
+    clean["Prediction"] = (proba >= 50).astype("int8")
+    clean["Recommendation"] = recommendations(proba, clean["Hemoglobin"].to_numpy())
+    return clean, bad_rows
+
+def scored_chunks(path, chunksize, workers, version=None):
+    # at most 2 chunks per worker are in flight, so memory stays bounded however large the input is
+    def tasks():
+        offset = 0
+        for chunk in iter_chunks(path, chunksize=chunksize):
+            yield chunk, offset
+            offset += len(chunk)
+
+    if workers <= 1:
+        _init_worker(version)
+        yield from map(score_chunk, tasks())
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(version,)) as pool:
+        pending = deque()
+        for task in tasks():
+            pending.append(pool.submit(score_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.format = detect_format(path)
+        self.parquet = None
+        self.wrote_header = False
+
+    def write(self, df):
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.parquet is None:
+                self.parquet = pq.ParquetWriter(self.path, table.schema)
+            self.parquet.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self.wrote_header else "w", header=not self.wrote_header, index=False)
+            self.wrote_header = True
+
+    def close(self):
+        if self.parquet is not None:
+            self.parquet.close()
+
+
+def load_into_db(db, df, kernel):
+    from backend import crud
+    from backend.ingest import frame_to_rows
+    rows = frame_to_rows(df.assign(probability=df[RISK_COL], prediction=df["Prediction"], model_version=kernel.version), kernel)
+    crud.bulk_insert_records(db, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a large CSV/Parquet/Feather file offline")
+    parser.add_argument("input")
+    parser.add_argument("output", help="output .csv or .parquet")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rejects", help="write skipped rows (row number + reason) to this CSV")
+    parser.add_argument("--load-db", action="store_true", help="also bulk-load scored rows into risk_records")
+    args = parser.parse_args()
+
+    # the registry's active version, as the backend serves it; resolved once so every worker agrees
+    version = active_version()
+    kernel = resolve(version)
+    print(f"Scoring with model version {kernel.version}")
+
+    db = None
+    if args.load_db:
+        header = next(iter_chunks(args.input, chunksize=1), pd.DataFrame()).columns
+        missing = [c for c in DB_COLUMNS if c not in header]
+        if missing:
+            raise SystemExit(f"--load-db needs {DB_COLUMNS} columns to store visits; {args.input} is missing {missing}")
+        from backend.database import SessionLocal, init_db
+        init_db()
+        db = SessionLocal()
+
+    writer = ChunkWriter(args.output)
+    rejects = []
+    n_rows = n_bad = 0
+    start = time.perf_counter()
+    try:
+        for scored, bad_rows in scored_chunks(args.input, args.chunksize, args.workers, version):
+            writer.write(scored)
+            if db is not None:
+                load_into_db(db, scored, kernel)
+            n_rows += len(scored)
+            n_bad += len(bad_rows)
+            if args.rejects and len(bad_rows):
+                rejects.append(bad_rows)
+            print(f"Scored {n_rows} rows ({n_rows / (time.perf_counter() - start):,.0f} rows/s), skipped {n_bad}")
+    finally:
+        writer.close()
+        if db is not None:
+            db.close()
+
+    if args.rejects:
+        pd.concat(rejects, ignore_index=True).to_csv(args.rejects, index=False) if rejects \
+            else pd.DataFrame(columns=["row", "reason"]).to_csv(args.rejects, index=False)
+
+
+if __name__ == "__main__":
+    main()
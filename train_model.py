@@ -1,45 +1,217 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+import numpy as np
 import pandas as pd
+from scipy.stats import loguniform
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import (classification_report,
                              confusion_matrix,
                              precision_score,
                              recall_score,
-                             f1_score)
-from sklearn.model_selection import train_test_split
+                             f1_score,
+                             roc_auc_score)
+from sklearn.model_selection import (train_test_split,
+                                     StratifiedKFold,
+                                     cross_validate,
+                                     GridSearchCV,
+                                     RandomizedSearchCV)
 from sklearn.impute import SimpleImputer
 import joblib
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+from backend.scoring import ScoringKernel, check_parity
+from backend.registry import publish, pipeline_path
 
+FEATURES = ["Gender", "Hemoglobin", "MCH", "MCHC", "MCV"]
+LABEL = "Result"
+MODEL_PATH = "model/anemia_model.pkl"
+RUNS_PATH = "model/train_runs.jsonl"
+PARAM_GRID = {"model__C": [0.01, 0.1, 1.0, 10.0, 100.0], "model__class_weight": ["balanced", None]}
+PARAM_DISTRIBUTIONS = {"model__C": loguniform(1e-3, 1e3), "model__class_weight": ["balanced", None]}
 
-df = pd.read_csv("data/raw/anemia.csv")
 
-X = df[["Gender", "Hemoglobin", "MCH", "MCHC", "MCV"]]
-y = df["Result"]
+def peak_memory_mb():
+    # ru_maxrss is in KB on Linux; children covers joblib workers used by n_jobs
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / 1024, 1)
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
 
-pipe = Pipeline([("impute", SimpleImputer(strategy='median')),
-                 ("scaler", StandardScaler()),
-                 ("model", LogisticRegression(max_iter=1000,class_weight='balanced'))])
+def iter_training_chunks(args):
+    yield from pd.read_csv(args.data, usecols=FEATURES + [LABEL], chunksize=args.chunksize)
 
-pipe.fit(X_train, y_train)
-y_pred = pipe.predict(X_test)
 
-print("\nConfusion Matrix\n", confusion_matrix(y_test, y_pred))
+def load_frame(args):
+    return pd.concat(iter_training_chunks(args), ignore_index=True)
 
-precision = precision_score(y_test, y_pred)
-recall = recall_score(y_test, y_pred)
-f1 = f1_score(y_test, y_pred)
 
-print(f"\nPrecision: {precision:.4f}")
-print(f"Recall: {recall:.4f}")
-print(f"F1 Score:{f1:.4f}")
+def build_pipeline(C=1.0, class_weight="balanced"):
+    return Pipeline([("impute", SimpleImputer(strategy='median')),
+                     ("scaler", StandardScaler()),
+                     ("model", LogisticRegression(C=C, max_iter=1000, class_weight=class_weight))])
 
-print("\nDetailed Breakdown:\n")
-print(classification_report(y_test, y_pred))
 
+def evaluate(pipe, X_test, y_test, verbose=True):
+    y_pred = pipe.predict(X_test)
+    metrics = {
+        "precision": precision_score(y_test, y_pred),
+        "recall": recall_score(y_test, y_pred),
+        "f1": f1_score(y_test, y_pred),
+        "roc_auc": roc_auc_score(y_test, pipe.predict_proba(X_test)[:, 1]),
+    }
+    if verbose:
+        print("\nConfusion Matrix\n", confusion_matrix(y_test, y_pred))
+        print(f"\nPrecision: {metrics['precision']:.4f}")
+        print(f"Recall: {metrics['recall']:.4f}")
+        print(f"F1 Score:{metrics['f1']:.4f}")
+        print(f"ROC AUC: {metrics['roc_auc']:.4f}")
+        print("\nDetailed Breakdown:\n")
+        print(classification_report(y_test, y_pred))
+    return {k: round(float(v), 4) for k, v in metrics.items()}
 
-joblib.dump(pipe,"model/anemia_model.pkl")
-print("Saved Logistic Regression Model")
 
+def train_in_memory(args, run):
+    df = load_frame(args)
+    X = df[FEATURES]
+    y = df[LABEL]
+    run["rows"] = len(df)
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+    cv = StratifiedKFold(n_splits=max(args.cv, 2), shuffle=True, random_state=42)
+
+    if args.search == "grid":
+        search = GridSearchCV(build_pipeline(), PARAM_GRID, scoring="f1", cv=cv, n_jobs=args.n_jobs)
+    elif args.search == "random":
+        search = RandomizedSearchCV(build_pipeline(), PARAM_DISTRIBUTIONS, n_iter=args.n_iter, scoring="f1",
+                                    cv=cv, n_jobs=args.n_jobs, random_state=42)
+    else:
+        search = None
+
+    if search is not None:
+        search.fit(X_train, y_train)
+        pipe = search.best_estimator_
+        run["best_params"] = dict(search.best_params_)
+        run["cv_f1"] = round(float(search.best_score_), 4)
+        print(f"\nBest params: {search.best_params_} (CV F1 {search.best_score_:.4f})")
+    else:
+        pipe = build_pipeline()
+        if args.cv > 1:
+            scores = cross_validate(pipe, X_train, y_train, cv=cv, n_jobs=args.n_jobs,
+                                    scoring=["precision", "recall", "f1", "roc_auc"])
+            run["cv"] = {k[5:]: round(float(np.mean(v)), 4) for k, v in scores.items() if k.startswith("test_")}
+            print(f"\n{args.cv}-fold CV: {run['cv']}")
+        pipe.fit(X_train, y_train)
+
+    run["metrics"] = evaluate(pipe, X_test, y_test)
+    return pipe, X_test
+
+
+def train_incremental(args, run):
+    # pass 1 learns imputation values, scaling and class balance; pass 2 fits the model chunk by chunk.
+    # every 5th row is held out for evaluation, capped at --holdout-max rows.
+    imputer = None
+    scaler = StandardScaler()
+    class_counts = {}
+    rows = 0
+    for chunk in iter_training_chunks(args):
+        X = chunk[FEATURES]
+        if imputer is None:
+            imputer = SimpleImputer(strategy="median").fit(X)
+        scaler.partial_fit(imputer.transform(X))
+        for label, count in chunk[LABEL].value_counts().items():
+            class_counts[label] = class_counts.get(label, 0) + int(count)
+        rows += len(chunk)
+    if imputer is None:
+        raise SystemExit("No training rows found")
+    run["rows"] = rows
+
+    classes = np.array(sorted(class_counts))
+    weights = {c: rows / (len(classes) * class_counts[c]) for c in classes}
+    model = SGDClassifier(loss="log_loss", alpha=args.alpha, class_weight=weights, random_state=42)
+
+    holdout_X, holdout_y, held = [], [], 0
+    for epoch in range(args.epochs):
+        for chunk in iter_training_chunks(args):
+            test_mask = np.arange(len(chunk)) % 5 == 0
+            train = chunk[~test_mask]
+            model.partial_fit(scaler.transform(imputer.transform(train[FEATURES])), train[LABEL], classes=classes)
+            if epoch == 0 and held < args.holdout_max:
+                test = chunk[test_mask].head(args.holdout_max - held)
+                holdout_X.append(test[FEATURES])
+                holdout_y.append(test[LABEL])
+                held += len(test)
+
+    pipe = Pipeline([("impute", imputer), ("scaler", scaler), ("model", model)])
+    X_test = pd.concat(holdout_X, ignore_index=True)
+    run["metrics"] = evaluate(pipe, X_test, pd.concat(holdout_y, ignore_index=True))
+    return pipe, X_test
+
+
+def record_run(run):
+    os.makedirs(os.path.dirname(RUNS_PATH), exist_ok=True)
+    with open(RUNS_PATH, "a") as f:
+        f.write(json.dumps(run, default=str) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the anemia risk model")
+    parser.add_argument("--data", default="data/raw/anemia.csv")
+    parser.add_argument("--cv", type=int, default=5, help="stratified folds (0/1 disables CV)")
+    parser.add_argument("--search", choices=["none", "grid", "random"], default="none")
+    parser.add_argument("--n-iter", type=int, default=20, help="candidates for --search random")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--incremental", action="store_true", help="out-of-core SGD training for data larger than RAM")
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--alpha", type=float, default=1e-4)
+    parser.add_argument("--holdout-max", type=int, default=200_000)
+    parser.add_argument("--output", default=MODEL_PATH, help="where --activate writes the active pipeline")
+    parser.add_argument("--activate", action="store_true",
+                        help="make this model the registry's active version (picked up by MODEL_WATCH_SECONDS)")
+    args = parser.parse_args()
+
+    run = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "source": args.data,
+        "mode": "incremental" if args.incremental else "in-memory",
+        "search": args.search,
+        "cv_folds": args.cv,
+        "n_jobs": args.n_jobs,
+    }
+    start = time.perf_counter()
+    pipe, X_test = train_incremental(args, run) if args.incremental else train_in_memory(args, run)
+    run["fit_seconds"] = round(time.perf_counter() - start, 3)
+    run["peak_memory_mb"] = peak_memory_mb()
+
+    kernel = ScoringKernel.from_pipeline(pipe)
+    if not check_parity(pipe, kernel, X_test):
+        raise SystemExit("Scoring kernel does not match pipeline output")
+    run["kernel_version"] = kernel.version
+
+    record_run(run)
+    meta = {k: run[k] for k in ("started_at", "source", "mode", "rows", "metrics") if k in run}
+    publish(kernel, meta, activate=args.activate)
+    joblib.dump(pipe, pipeline_path(kernel.version))
+    print(f"Published model version {kernel.version}" + (" (active)" if args.activate else ""))
+
+    # model/ holds what load_kernel() serves (dashboard, score_batch, ingest), so only an activated model goes there
+    if args.activate:
+        joblib.dump(pipe, args.output)
+        kernel.save(os.path.join(os.path.dirname(args.output) or ".", "anemia_kernel.json"), model_path=args.output)
+        print(f"Saved {type(pipe.named_steps['model']).__name__} model to {args.output} and scoring kernel")
+    else:
+        print(f"Candidate only; run with --activate or POST /admin/model/reload?version={kernel.version} to serve it")
+    print(f"\nFit time: {run['fit_seconds']}s, peak memory: {run['peak_memory_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
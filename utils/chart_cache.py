@@ -0,0 +1,76 @@
+import os
+import atexit
+import hashlib
+import tempfile
+import threading
+
+CACHE_DIR = os.getenv("CHART_CACHE_DIR", os.path.join(tempfile.gettempdir(), "anemia_chart_cache"))
+CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_MB", "64")) * 1024 * 1024
+CHART_WIDTH = 1000
+CHART_HEIGHT = 560
+
+_lock = threading.Lock()
+_kaleido_started = False
+
+def _warm_kaleido():
+    # keep one headless browser alive for the whole process instead of launching one per image
+    global _kaleido_started
+    if _kaleido_started:
+        return
+    with _lock:
+        if _kaleido_started:
+            return
+        try:
+            import kaleido
+            kaleido.start_sync_server(silence_warnings=True)
+            atexit.register(kaleido.stop_sync_server, silence_warnings=True)
+        except Exception:
+            pass
+        _kaleido_started = True
+
+def figure_key(fig, width=CHART_WIDTH, height=CHART_HEIGHT):
+    spec = fig.to_json() + f"|{width}x{height}"
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+def _evict(max_bytes=CACHE_MAX_BYTES):
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".png"):
+            continue
+        try:
+            st = os.stat(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def render_png(fig, width=CHART_WIDTH, height=CHART_HEIGHT):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{figure_key(fig, width, height)}.png")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+        return data
+    except FileNotFoundError:
+        pass
+
+    data = fig.to_image(format="png", width=width, height=height)
+    # only start the shared server once a render has worked: if Chrome is missing the
+    # server thread dies and later calls would block instead of raising
+    _warm_kaleido()
+    # write to a private temp file then rename, so concurrent sessions never see a half-written chart
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    _evict()
+    return data
@@ -0,0 +1,143 @@
+import os
+import numpy as np
+import pandas as pd
+
+PATIENT_ID = "Patient_ID"
+DATE_COL = "Date"
+FEATURES = ["Gender", "Hemoglobin", "MCH", "MCHC", "MCV"]
+LABS = ["Hemoglobin", "MCH", "MCHC", "MCV"]
+SCHEMA = {
+    PATIENT_ID: "int32",
+    "Gender": "int8",
+    "Hemoglobin": "float32",
+    "MCH": "float32",
+    "MCHC": "float32",
+    "MCV": "float32",
+    "Result": "int8",
+}
+CHUNK_ROWS = 100_000
+MAX_REPORTED_ROWS = 1000
+
+
+class IngestError(ValueError):
+    pass
+
+
+def detect_format(name):
+    name = (name or "").lower()
+    if name.endswith((".parquet", ".pq")):
+        return "parquet"
+    if name.endswith((".feather", ".arrow")):
+        return "feather"
+    return "csv"
+
+
+def _iter_csv(source, name, chunksize):
+    compression = "gzip" if (name or "").lower().endswith(".gz") else "infer"
+    yield from pd.read_csv(source, chunksize=chunksize, compression=compression, low_memory=False)
+
+
+def _iter_parquet(source, chunksize):
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def _iter_feather(source, chunksize):
+    import pyarrow as pa
+    reader = pa.ipc.open_file(source)
+    for i in range(reader.num_record_batches):
+        yield reader.get_batch(i).to_pandas()
+
+
+def iter_chunks(source, name=None, chunksize=CHUNK_ROWS):
+    if name is None and isinstance(source, (str, os.PathLike)):
+        name = os.fspath(source)
+    fmt = detect_format(name)
+    if fmt == "parquet":
+        return _iter_parquet(source, chunksize)
+    if fmt == "feather":
+        return _iter_feather(source, chunksize)
+    return _iter_csv(source, name, chunksize)
+
+
+def _present(raw: pd.Series):
+    # blank cells are missing values, not invalid ones; the model's imputer fills missing labs
+    present = raw.notna()
+    if raw.dtype == object:
+        present &= raw.astype(str).str.strip() != ""
+    return present
+
+
+def clean_chunk(chunk: pd.DataFrame, offset=0):
+    missing = [c for c in FEATURES if c not in chunk.columns]
+    if missing:
+        raise IngestError(f"Missing required columns: {missing}")
+
+    reasons = pd.Series("", index=chunk.index, dtype=object)
+    out = pd.DataFrame(index=chunk.index)
+
+    if PATIENT_ID in chunk.columns:
+        pid = pd.to_numeric(chunk[PATIENT_ID], errors="coerce")
+        bad = (pid.isna() & _present(chunk[PATIENT_ID])) | (pid.notna() & (pid % 1 != 0))
+        reasons[bad] += f"invalid {PATIENT_ID}; "
+        out[PATIENT_ID] = pid
+    if DATE_COL in chunk.columns:
+        dates = pd.to_datetime(chunk[DATE_COL], errors="coerce")
+        reasons[dates.isna() & _present(chunk[DATE_COL])] += f"invalid {DATE_COL}; "
+        out[DATE_COL] = dates
+
+    for col in FEATURES:
+        values = pd.to_numeric(chunk[col], errors="coerce")
+        reasons[values.isna() & _present(chunk[col])] += f"invalid {col}; "
+        out[col] = values
+    reasons[out["Gender"].notna() & ~out["Gender"].isin([0, 1])] += "Gender must be 0 or 1; "
+
+    if "Result" in chunk.columns:
+        out["Result"] = pd.to_numeric(chunk["Result"], errors="coerce")
+    for col in chunk.columns:
+        if col not in out.columns:
+            out[col] = chunk[col]
+
+    bad = reasons != ""
+    report = pd.DataFrame({
+        "row": np.flatnonzero(bad.to_numpy()) + offset + 1,
+        "reason": reasons[bad].str.rstrip("; ").to_numpy(),
+    })
+    out = out[~bad.to_numpy()]
+    dtypes = {c: t for c, t in SCHEMA.items() if c in out.columns}
+    for col, t in dtypes.items():
+        # integer columns with missing values use the nullable variant (Int8, Int32)
+        if t.startswith("int") and out[col].isna().any():
+            dtypes[col] = t.capitalize()
+    return out.astype(dtypes), report
+
+
+def iter_dataset(source, name=None, chunksize=CHUNK_ROWS, rename=None):
+    # (clean chunk, bad-row report) per chunk, for consumers that can work chunk by chunk
+    offset = 0
+    for chunk in iter_chunks(source, name, chunksize):
+        if rename:
+            chunk = chunk.rename(columns=rename)
+        clean, report = clean_chunk(chunk, offset)
+        offset += len(chunk)
+        yield clean, report
+
+
+def read_dataset(source, name=None, chunksize=CHUNK_ROWS, max_reported=MAX_REPORTED_ROWS, rename=None):
+    # for callers that need the whole frame (the dashboard); only the typed chunks are held, never the raw input
+    frames, reports = [], []
+    n_bad = n_reported = 0
+    for clean, report in iter_dataset(source, name, chunksize, rename):
+        frames.append(clean)
+        n_bad += len(report)
+        if n_reported < max_reported:
+            reports.append(report.head(max_reported - n_reported))
+            n_reported += len(reports[-1])
+    if not frames:
+        return pd.DataFrame(columns=list(SCHEMA)), pd.DataFrame(columns=["row", "reason"])
+    data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+    del frames
+    bad_rows = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=["row", "reason"])
+    bad_rows.attrs["total"] = n_bad
+    return data, bad_rows
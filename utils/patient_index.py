@@ -0,0 +1,89 @@
+import bisect
+import numpy as np
+import pandas as pd
+
+PATIENT_ID = "Patient_ID"
+DATE_COL = "Date"
+
+
+def _typed(data: pd.DataFrame):
+    # ingest and VisitBuffer frames are already typed; anything else gets a converted copy
+    convert_ids = not pd.api.types.is_integer_dtype(data[PATIENT_ID])
+    convert_dates = DATE_COL in data.columns and not pd.api.types.is_datetime64_any_dtype(data[DATE_COL])
+    if not (convert_ids or convert_dates):
+        return data
+    df = data.copy()
+    if convert_ids:
+        df[PATIENT_ID] = pd.to_numeric(df[PATIENT_ID], errors="coerce").astype("Int64")
+    if convert_dates:
+        df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors="coerce")
+    return df
+
+
+class PatientIndex:
+    # Row positions of each patient's visits in Date order, so selecting a patient is one iloc take
+    # instead of a filter + sort over the whole frame. Positions are kept per patient, which lets
+    # extend() merge appended rows into only the patients they touch; the full (Patient_ID, Date)
+    # ordering for "All" is assembled lazily.
+    def __init__(self, data: pd.DataFrame):
+        self.frame = _typed(data)
+        self.patient_ids = []
+        self.positions = {}
+        self.unassigned = np.array([], dtype=np.int64)
+        self.size = 0
+        self._all = None
+        self._add(0, len(data))
+
+    def __len__(self):
+        return len(self.patient_ids)
+
+    def _dates(self, rows):
+        if DATE_COL not in self.frame.columns:
+            return np.zeros(len(rows), dtype=np.int64)
+        dates = self.frame[DATE_COL].to_numpy()[rows]
+        # NaT sorts last within a patient
+        return np.where(np.isnat(dates), np.iinfo(np.int64).max, dates.astype("datetime64[ns]").astype(np.int64))
+
+    def _by_date(self, rows):
+        return rows[np.argsort(self._dates(rows), kind="stable")]
+
+    def _add(self, start, stop):
+        if stop <= start:
+            return
+        ids = self.frame[PATIENT_ID].iloc[start:stop]
+        rows = np.arange(start, stop, dtype=np.int64)
+        valid = ids.notna().to_numpy()
+        if not valid.all():
+            self.unassigned = self._by_date(np.concatenate([self.unassigned, rows[~valid]]))
+        rows = rows[valid]
+        keys = ids.to_numpy()[valid].astype(np.int64)
+        order = np.lexsort((self._dates(rows), keys))
+        rows, keys = rows[order], keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(keys)].astype(int)
+        for pid, a, b in zip(keys[starts].tolist(), starts.tolist(), stops.tolist()):
+            existing = self.positions.get(pid)
+            if existing is None:
+                self.positions[pid] = rows[a:b]
+                bisect.insort(self.patient_ids, pid)
+            else:
+                self.positions[pid] = self._by_date(np.concatenate([existing, rows[a:b]]))
+        self.size = stop
+        self._all = None
+
+    def extend(self, data: pd.DataFrame):
+        # data must be the indexed frame with rows appended at the end (e.g. VisitBuffer.to_frame())
+        self.frame = _typed(data)
+        self._add(self.size, len(data))
+        return self
+
+    def view(self, patient_id=None):
+        if patient_id is None or patient_id == "All":
+            if self._all is None:
+                parts = [self.positions[pid] for pid in self.patient_ids] + [self.unassigned]
+                self._all = self.frame.iloc[np.concatenate(parts)].reset_index(drop=True)
+            return self._all
+        rows = self.positions.get(patient_id)
+        if rows is None:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[rows].reset_index(drop=True)
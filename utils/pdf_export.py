@@ -1,25 +1,58 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.colors import red, orange, green, black
-from reportlab.platypus import SimpleDocTemplate, Spacer, Table, TableStyle, Image, Paragraph
-from reportlab.lib.units import cm
+import os
+import numpy as np
 import pandas as pd
+import zipfile
+import tempfile
 from io import BytesIO
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
-def risk_color(value):
-    try:
-        v = float(value)
-        if v >= 80:
-            return red
-        elif v >= 60:
-            return orange
-        else:
-            return green
-    except:
-        return black  
-
-def generate_pdf(results_df: pd.DataFrame, patient_id = None, chart_path=None):
+# ReportLab is imported inside the functions below so the dashboard only loads it on the first export
+
+RISK_COL = "Risk Probability (%)"
+ROWS_PER_TABLE = 40
+# ZIPs larger than this spill from memory to a temporary file while they are written
+ZIP_SPOOL_BYTES = 16 * 1024 * 1024
+
+def risk_colors(values):
+    v = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+    return np.select([np.isnan(v), v >= 80, v >= 60], [0, 1, 2], default=3)
+
+COLOR_CODES = ["black", "red", "orange", "green"]
+
+def _table_chunks(results_df: pd.DataFrame, rows_per_table=ROWS_PER_TABLE):
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+    palette = [getattr(colors, name) for name in COLOR_CODES]
+    header = [str(c) for c in results_df.columns]
+    cells = results_df.astype(str).to_numpy()
+    codes = risk_colors(results_df[RISK_COL]) if RISK_COL in results_df.columns else None
+    risk_col_index = results_df.columns.get_loc(RISK_COL) if codes is not None else None
+
+    for start in range(0, len(cells), rows_per_table):
+        data = [header] + cells[start:start + rows_per_table].tolist()
+        style = TableStyle([
+            ("BACKGROUND", (0,0), (-1, 0), "#DDDDDD"),
+            ("GRID", (0,0), (-1, -1),1,colors.black),
+            ("ALIGN", (0,0), (-1, 0), "CENTER"),
+            ("VALIGN", (0,0), (-1, -1), "MIDDLE"),
+        ])
+        if codes is not None:
+            # one TEXTCOLOR command per run of equal colors instead of one per row
+            chunk_codes = codes[start:start + rows_per_table]
+            breaks = np.flatnonzero(np.diff(chunk_codes)) + 1
+            for run_start, run_end in zip(np.r_[0, breaks], np.r_[breaks, len(chunk_codes)]):
+                style.add("TEXTCOLOR", (risk_col_index, run_start + 1), (risk_col_index, run_end),
+                          palette[chunk_codes[run_start]])
+        table = Table(data, repeatRows=1)
+        table.setStyle(style)
+        yield table
+
+def generate_pdf(results_df: pd.DataFrame, patient_id = None, chart_path=None, chart_png=None):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Spacer, Image, Paragraph
+    from reportlab.lib.units import cm
     buffer = BytesIO()
 
     doc = SimpleDocTemplate(
@@ -42,40 +75,44 @@ def generate_pdf(results_df: pd.DataFrame, patient_id = None, chart_path=None):
         story.append(Paragraph(f"Patient ID: {patient_id}", styles["Normal"]))
     story.append(Spacer(1, 12))
 
-    data = [list(results_df.columns)]
-    for _, row in results_df.iterrows():
-        data.append([str(x) for x in row.values])
-
-    table = Table(data, repeatRows=1)
-
-    style = TableStyle([
-        ("BACKGROUND", (0,0), (-1, 0), "#DDDDDD"),
-        ("GRID", (0,0), (len(data[0])-1, len(data)-1),1,black),
-        ("ALIGN", (0,0), (-1, 0), "CENTER"),
-        ("VALIGN", (0,0), (-1, -1), "MIDDLE"),
-    ])    
-
-    if "Risk Probability (%)" in results_df.columns:
-        risk_col_index = results_df.columns.get_loc("Risk Probability (%)")
-        for row_idx in range(1, len(data)):
-            value = data[row_idx][risk_col_index]
-            style.add(
-                "TEXTCOLOR",
-                (risk_col_index, row_idx),
-                (risk_col_index, row_idx),
-                risk_color(value)
-            )
-
-    table.setStyle(style)
-    story.append(table)
+    story.extend(_table_chunks(results_df))
 
     story.append(Spacer(1, 12))
 
-    if chart_path:
+    chart = BytesIO(chart_png) if chart_png else chart_path
+    if chart:
         story.append(Paragraph("Risk Trend Chart", styles["Heading2"]))
         story.append(Spacer(1, 8))
-        story.append(Image(chart_path, width=16*cm, height=9*cm))
+        story.append(Image(chart, width=16*cm, height=9*cm))
     doc.build(story)        
     
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
+
+def _patient_report(args):
+    patient_id, patient_df = args
+    return patient_id, generate_pdf(patient_df, patient_id=patient_id).getvalue()
+
+def generate_patient_reports_zip(results_df: pd.DataFrame, patient_col="Patient_ID", max_workers=None, dest=None):
+    # dest is a path or writable binary file; by default a spooled temporary file, returned rewound
+    out = dest if dest is not None else tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES)
+    workers = max_workers or os.cpu_count() or 1
+    groups = ((pid, g) for pid, g in results_df.groupby(patient_col, sort=True))
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+         zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        # at most 2 patients per worker are pickled or in flight; each PDF goes into the archive
+        # as soon as it is done and is released right after
+        pending = set()
+        for group in groups:
+            pending.add(pool.submit(_patient_report, group))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    patient_id, pdf_bytes = future.result()
+                    zf.writestr(f"anemia_report_patient_{patient_id}.pdf", pdf_bytes)
+        for future in wait(pending).done:
+            patient_id, pdf_bytes = future.result()
+            zf.writestr(f"anemia_report_patient_{patient_id}.pdf", pdf_bytes)
+    if dest is None:
+        out.seek(0)
+    return out
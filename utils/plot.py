@@ -1,13 +1,97 @@
 import streamlit as st
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from plotly.subplots import make_subplots
 
 DATE_COL = "Date"
+PATIENT_ID = "Patient_ID"
+POINT_BUDGET = 5000
+WEBGL_THRESHOLD = 2000
+HIST_BINS = 20
+MAX_PATIENT_LINES = 500
+BAND_COLORS = {"low": "#2ECC71", "moderate": "#F5B041", "high": "#E74C3C"}
+GENDER_NAMES = {0: "Female", 1: "Male", -1: "Unknown"}
+
+def scatter_trace(n_points, **kwargs):
+    # WebGL keeps the browser responsive once the SVG renderer would have to draw thousands of markers
+    return go.Scattergl(**kwargs) if n_points > WEBGL_THRESHOLD else go.Scatter(**kwargs)
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the visual shape of a series with n_out points
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:nxt_hi].mean() if nxt_hi > hi else x[-1]
+        avg_y = y[hi:nxt_hi].mean() if nxt_hi > hi else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.nanargmax(area)) if len(area) and not np.all(np.isnan(area)) else lo
+        keep[i + 1] = a
+    return keep
+
+def downsample(df, x_col, y_col, budget=POINT_BUDGET):
+    if len(df) <= budget:
+        return df
+    x = pd.to_datetime(df[x_col]).to_numpy().astype("datetime64[ns]").astype(np.int64) \
+        if not pd.api.types.is_numeric_dtype(df[x_col]) else df[x_col].to_numpy()
+    return df.iloc[lttb(x, df[y_col].to_numpy(dtype=float), budget)]
+
+def patient_lines(df, y_col, budget=POINT_BUDGET, max_patients=MAX_PATIENT_LINES):
+    # all patients go into one trace; a NaN point between patients breaks the line
+    df = df.sort_values([PATIENT_ID, DATE_COL], kind="mergesort")
+    keys = df[PATIENT_ID].to_numpy()
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stops = np.r_[starts[1:], len(df)]
+    n_patients = len(starts)
+    if n_patients > max_patients:
+        pick = np.linspace(0, n_patients - 1, max_patients).astype(int)
+        starts, stops = starts[pick], stops[pick]
+    per_patient = max(3, budget // len(starts))
+    x = df[DATE_COL].to_numpy().astype("datetime64[ns]")
+    y = df[y_col].to_numpy(dtype=float)
+    parts = []
+    for start, stop in zip(starts, stops):
+        idx = start + lttb(x[start:stop].astype(np.int64), y[start:stop], per_patient) \
+            if stop - start > per_patient else np.arange(start, stop)
+        parts.extend([idx, [-1]])
+    idx = np.concatenate(parts[:-1]).astype(int)
+    gap = idx < 0
+    return np.where(gap, np.datetime64("NaT"), x[idx]), np.where(gap, np.nan, y[idx]), len(starts), n_patients
+
+def binned_histogram(values, nbins=HIST_BINS):
+    v = np.asarray(values, dtype=float)
+    v = v[~np.isnan(v)]
+    counts, edges = np.histogram(v, bins=nbins)
+    quartiles = np.percentile(v, [0, 25, 50, 75, 100]) if len(v) else np.full(5, np.nan)
+    return counts, edges, quartiles
 
 def plot_hb_dist(df):
     st.subheader("📈 Hemoglobin Distribution")
+    if len(df) > WEBGL_THRESHOLD:
+        # ship 20 bar heights and five box statistics instead of every raw value
+        counts, edges, (lo, q1, med, q3, hi) = binned_histogram(df["Hemoglobin"])
+        fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+        fig.add_trace(go.Box(q1=[q1], median=[med], q3=[q3], lowerfence=[lo], upperfence=[hi],
+                             y=["Hemoglobin"], orientation="h", showlegend=False), row=1, col=1)
+        fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                             opacity=0.75, showlegend=False), row=2, col=1)
+        fig.update_yaxes(showticklabels=False, row=1, col=1)
+        fig.update_layout(title="Hemoglobin Distribution", bargap=0)
+        fig.update_xaxes(title="Hemoglobin", row=2, col=1)
+        fig.update_yaxes(title="Count", row=2, col=1)
+        fig.update_layout(height=400)
+        st.plotly_chart(fig, use_container_width=True)
+        return
     fig = px.histogram(df,
                        x="Hemoglobin",
                        nbins=20,
@@ -23,11 +107,24 @@ def plot_hb_trend(df, has_date):
         st.info("Add Date column to see trends.")
         return
 
-    fig = px.line(df,
-                  x="Date",
-                  y="Hemoglobin",
-                  markers=True,
-                  title="Hemoglobin Trend Over Time")
+    if len(df) <= POINT_BUDGET:
+        fig = px.line(df,
+                      x="Date",
+                      y="Hemoglobin",
+                      markers=True,
+                      title="Hemoglobin Trend Over Time")
+    elif PATIENT_ID in df.columns and df[PATIENT_ID].nunique() > 1:
+        x, y, shown, total = patient_lines(df, "Hemoglobin")
+        fig = go.Figure(scatter_trace(len(x), x=x, y=y, mode="lines+markers", name="Hemoglobin",
+                                      connectgaps=False, marker=dict(size=4)))
+        title = "Hemoglobin Trend Over Time"
+        if shown < total:
+            title += f" ({shown} of {total} patients)"
+        fig.update_layout(title=title)
+    else:
+        trend = downsample(df, "Date", "Hemoglobin")
+        fig = go.Figure(scatter_trace(len(trend), x=trend["Date"], y=trend["Hemoglobin"], mode="lines", name="Hemoglobin"))
+        fig.update_layout(title="Hemoglobin Trend Over Time")
     fig.add_hline(y=12, line_dash="dash", line_color="red", annotation_text="Low Threshold")
     fig.update_xaxes(tickformat="%Y-%m-%d", tickangle=-30, showgrid=True)
     fig.update_yaxes(title="Hemoglobin")
@@ -42,8 +139,9 @@ def plot_risk_trend(results, df, has_date):
     if len(results) < 2:
         st.info("Not enough data points to show risk trend")
     trend_df = results.groupby("Date",as_index=False)["Risk Probability (%)"].mean()
+    trend_df = downsample(trend_df, "Date", "Risk Probability (%)")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=trend_df["Date"],
+    fig.add_trace(scatter_trace(len(trend_df), x=trend_df["Date"],
                              y=trend_df["Risk Probability (%)"],
                              mode="lines+markers",
                              name="Historical Risk",
@@ -83,8 +181,9 @@ def plot_forecast(results, df, future_prob, future_date, has_date):
     last_risk = trend_df["Risk Probability (%)"].iloc[-1]
     trend = last_risk - trend_df["Risk Probability (%)"].iloc[-2]
     future_prob = max(min(future_prob, last_risk + 15), last_risk - 15)
+    trend_df = downsample(trend_df, "Date", "Risk Probability (%)")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=trend_df["Date"],
+    fig.add_trace(scatter_trace(len(trend_df), x=trend_df["Date"],
                              y=trend_df["Risk Probability (%)"],
                              mode="lines+markers",
                              name="Past Risk",
@@ -127,4 +226,28 @@ def plot_forecast(results, df, future_prob, future_date, has_date):
     else:
           st.success("🟢 Risk expected to remain stable or improve")  
     
-    return fig
\ No newline at end of file
+    return fig
+
+
+def plot_population_trend(grouped, overall, group_col="risk_band"):
+    # both frames come from the rollup tables, so the trace size is one point per period
+    st.subheader("Population Trend")
+    if overall.empty:
+        st.info("No stored visits to summarise yet.")
+        return
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.4, 0.6], vertical_spacing=0.06)
+    for value, part in grouped.groupby(group_col, sort=True):
+        name = GENDER_NAMES.get(value, str(value)) if group_col == "gender" else str(value).title()
+        fig.add_trace(go.Bar(x=part["period_start"], y=part["count"], name=name,
+                             marker_color=BAND_COLORS.get(value)), row=1, col=1)
+    fig.add_trace(go.Scatter(x=overall["period_start"], y=overall["mean_probability"], mode="lines+markers",
+                             name="Mean risk", line=dict(width=3, color="#4CC9F0")), row=2, col=1)
+    fig.add_trace(go.Scatter(x=overall["period_start"], y=overall["p90_probability"], mode="lines",
+                             name="P90 risk", line=dict(width=2, dash="dash", color="orange")), row=2, col=1)
+    fig.add_trace(go.Scatter(x=overall["period_start"], y=overall["low_hb_share"] * 100, mode="lines",
+                             name="Hb < 12 (%)", line=dict(width=2, dash="dot", color="red")), row=2, col=1)
+    fig.update_layout(barmode="stack", hovermode="x unified", template="plotly_dark", height=550,
+                      title="Stored Visits and Risk Over Time")
+    fig.update_yaxes(title="Visits", row=1, col=1)
+    fig.update_yaxes(title="Risk / share (%)", range=[0, 100], row=2, col=1)
+    st.plotly_chart(fig, use_container_width=True)
@@ -1,15 +1,98 @@
+import os
 import pandas as pd
-import requests
 import streamlit as st
-import time
+from backend.scoring import calibrate
+from backend.cache import PredictionCache, cached_scores, feature_keys
+from utils.timeseries import smooth_risk, patient_summary, sort_visits
 
-session = requests.Session()
-
-API_URL = "https://anemiaproject-production.up.railway.app/predict"
+BATCH_SIZE = int(os.getenv("REMOTE_BATCH_SIZE", "500"))
 REQUIRED_FEATURES = ["Gender", "Hemoglobin", "MCH", "MCHC", "MCV"]
-
-def run_predictions(df:pd.DataFrame, model, features):
-    df["Patient_ID"] = pd.to_numeric(df["Patient_ID"], errors='coerce').astype("Int64")
+INFERENCE_MODES = ("local", "remote", "auto")
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "auto")
+
+@st.cache_resource
+def prediction_cache():
+    return PredictionCache()
+
+def predict_local(df:pd.DataFrame, model, features):
+    X = df[features].to_numpy(dtype=float)
+    return cached_scores(prediction_cache(), X, lambda X: calibrate(model.predict_proba(X)[:, 1]), model.version)
+
+@st.cache_resource
+def remote_client():
+    # requests/urllib3 are only loaded once remote inference is actually used
+    from utils.remote_client import client_from_env
+    return client_from_env()
+
+def remember_remote(df:pd.DataFrame, proba, versions):
+    # keyed on the backend's model version, the same namespace predict_local uses for that kernel
+    cache = prediction_cache()
+    X = df[REQUIRED_FEATURES].to_numpy(dtype=float)
+    by_version = {}
+    for i, (p, v) in enumerate(zip(proba, versions)):
+        if p is not None and v:
+            by_version.setdefault(v, []).append(i)
+    for version, rows in by_version.items():
+        cache.put_many(feature_keys(X[rows], version), [proba[i] for i in rows])
+
+@st.cache_data(show_spinner=False)
+def post_visits(visits:pd.DataFrame):
+    # cached on the frame: Streamlit reruns the script on every widget change and each POST to
+    # /predict/batch stores the visits again, so the same rows are only sent once
+    payloads = [
+        {
+            "patient_id": int(pid) if pd.notna(pid) else 0,
+            "date": str(d),
+            "Gender": int(g),
+            "Hemoglobin": float(hb),
+            "MCH": float(mch),
+            "MCHC": float(mchc),
+            "MCV": float(mcv),
+        }
+        for pid, d, g, hb, mch, mchc, mcv in zip(
+            visits["Patient_ID"],
+            visits["Date"] if "Date" in visits.columns else [""] * len(visits),
+            visits["Gender"], visits["Hemoglobin"], visits["MCH"], visits["MCHC"], visits["MCV"],
+        )
+    ]
+    fresh, versions, errors = remote_client().predict(payloads, batch_size=BATCH_SIZE)
+    if errors and all(p is None for p in fresh):
+        # nothing was stored, so the failure is not cached and the next rerun tries again
+        raise RuntimeError("; ".join(errors))
+    return fresh, versions, errors
+
+def predict_remote(df:pd.DataFrame):
+    # the API needs every lab and a date; incomplete rows are only scored by the local imputer
+    complete = df[REQUIRED_FEATURES].notna().all(axis=1).to_numpy()
+    if "Date" in df.columns:
+        complete &= df["Date"].notna().to_numpy()
+    if not complete.all():
+        st.warning(f"{int((~complete).sum())} rows with missing labs or dates were not sent to the backend.")
+    rows = complete.nonzero()[0]
+    columns = [c for c in ["Patient_ID", "Date", *REQUIRED_FEATURES] if c in df.columns]
+    visits = df.iloc[rows][columns].reset_index(drop=True)
+
+    fresh, versions = [None] * len(visits), [None] * len(visits)
+    if len(visits):
+        try:
+            fresh, versions, errors = post_visits(visits)
+        except RuntimeError as e:
+            errors = [str(e)]
+        for err in errors:
+            st.error(err)
+    remember_remote(visits, fresh, versions)
+    proba = [None] * len(complete)
+    for i, p in zip(rows, fresh):
+        proba[i] = p
+    return proba
+
+
+def run_predictions(df:pd.DataFrame, model, features, mode=INFERENCE_MODE):
+    if mode not in INFERENCE_MODES:
+        st.error(f"Unknown inference mode '{mode}', expected one of {INFERENCE_MODES}")
+        st.stop()
+    if not pd.api.types.is_integer_dtype(df["Patient_ID"]):
+        df["Patient_ID"] = pd.to_numeric(df["Patient_ID"], errors='coerce').astype("Int64")
     if pd.api.types.is_datetime64_any_dtype(df["Patient_ID"]):
         st.error('BUG')
         st.stop()
@@ -19,62 +102,39 @@ def run_predictions(df:pd.DataFrame, model, features):
         st.error(f"Missing required columns:{missing}")
         st.stop()
 
-    df = df.sort_values(by=["Patient_ID", "Date"],key=lambda col: col.astype("Int64") if col.name == "Patient_ID" else col).copy()
+    if "Date" in df.columns:
+        df = sort_visits(df)
+    else:
+        df = df.sort_values(by="Patient_ID", kind="mergesort")
     results = df.copy()
 
-    proba = []
-    
-
-    for _,row in df.iterrows():
-
-        payload = {
-            "patient_id": int(row.get("Patient_ID", 0)),
-            "date" : str(row.get("Date", "")),
-            "Gender" : int(row["Gender"]),
-            "Hemoglobin" : float(row["Hemoglobin"]),
-            "MCH" : float(row["MCH"]),
-            "MCHC" : float(row["MCHC"]),
-            "MCV" : float(row["MCV"]),
-        }
-
+    if mode == "local" or (mode == "auto" and model is not None):
         try:
-            time.sleep(1.5)
-            r = session.post(API_URL, json=payload, timeout=60, headers={"Content-Type": "application/json"})
-            if r.status_code == 200:
-                data = r.json()
-                prob = data.get("result",{}).get("probability", None)
-                proba.append(prob)
-            else:
-                st.error(f"Backend error {r.status_code}:{r.text}")
-                proba.append(None)
-
-
+            proba = predict_local(df, model, features)
         except Exception as e:
-            st.error(f"Backend error: {e}")
-            proba.append(None)
+            if mode == "local":
+                st.error(f"Local inference failed: {e}")
+                st.stop()
+            st.warning(f"Local inference failed ({e}), falling back to backend API.")
+            proba = predict_remote(df)
+    else:
+        proba = predict_remote(df)
 
     results["Risk Probability (%)"] = proba
-    results["Risk Probability (%)"] = (results["Risk Probability (%)"].rolling(window=3, min_periods=1).mean())
+    results["Risk Probability (%)"] = pd.to_numeric(results["Risk Probability (%)"], errors="coerce")
+    results["Risk Probability (%)"] = smooth_risk(results)
     results["Prediction"] = results["Risk Probability (%)"].apply(lambda x : 1 if x is not None and x >= 50 else 0)
 
     return results
 
 def forecast_next_visit(results, df, model):
-    df = df.copy()
-    results=results.copy()
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    results["Date"] = pd.to_datetime(results["Date"], errors="coerce")
-
     if len(results) < 3:
         return None, None
-    df = df.sort_values("Date")
-    results = results.sort_values("Date")
-    current_prob = float(results["Risk Probability (%)"].iloc[-1])
-    recent_hb = df["Hemoglobin"].tail(3)
-    hb_trend = recent_hb.diff().mean()
-    trend_impact = -hb_trend * 8.0
-    future_prob = current_prob + trend_impact
-    future_prob = max(5.0, min(95.0, future_prob))
-    future_date = df["Date"].iloc[-1] + pd.to_timedelta(30, unit="d")
-
-    return round(float(future_prob), 2), future_date
\ No newline at end of file
+    results = results.copy()
+    results["Date"] = pd.to_datetime(results["Date"], errors="coerce")
+    summary = patient_summary(results)
+    # a single forecast only makes sense for one patient, use patient_summary() for cohorts
+    if len(summary) != 1 or pd.isna(summary["Forecast Risk (%)"].iloc[0]):
+        return None, None
+    row = summary.iloc[0]
+    return float(row["Forecast Risk (%)"]), row["Forecast Date"]
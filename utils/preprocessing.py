@@ -1,31 +1,84 @@
 import pandas as pd
 import streamlit as st
+from utils.ingest import read_dataset
+from utils.patient_index import PatientIndex
 
 DATE_COL = "Date"
 PATIENT_ID = "Patient_ID"
+COHORT_FIELDS = ["patient_id", "date", "Gender", "Hemoglobin", "MCH", "MCHC", "MCV"]
+EXPORT_COLUMNS = {"patient_id": PATIENT_ID, "date": DATE_COL}
 
+@st.cache_resource(show_spinner=False)
 def load_data(path):
     try: 
-        return pd.read_csv(path)
+        return read_dataset(path)[0]
     except Exception:
         st.warning("No default dataset found. Using empty dataset until upload.")
         return pd.DataFrame()
 
 
-def prepare_patient_view(data:pd.DataFrame):
-    df = data.copy()
+def load_cohort(patient_ids=None, start=None, end=None, prediction=None):
+    # parsed chunk by chunk straight off the backend's /export stream, never buffered whole
+    from utils.prediction import remote_client
+    params = {
+        "format": "csv",
+        "fields": ",".join(COHORT_FIELDS),
+        "patient_ids": ",".join(str(p) for p in patient_ids) if patient_ids else None,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "prediction": prediction,
+    }
+    with remote_client().export_stream(**params) as r:
+        return read_dataset(r.raw, name="export.csv", rename=EXPORT_COLUMNS)
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def population_summary(period="month", by="risk_band", start=None, end=None):
+    # pre-aggregated rollups from the backend's /cohort/summary; size depends on the date range only
+    from utils.prediction import remote_client
+    rows = remote_client().cohort_summary(
+        period=period,
+        by=by,
+        start=start.isoformat() if start else None,
+        end=end.isoformat() if end else None,
+    )
+    summary = pd.DataFrame(rows)
+    if not summary.empty:
+        summary["period_start"] = pd.to_datetime(summary["period_start"])
+    return summary
+
+
+def patient_index(data:pd.DataFrame, data_key):
+    # rebuilt only when the dataset changes, not on every rerun
+    cached = st.session_state.get("patient_index")
+    if cached is None or cached[0] != data_key:
+        cached = (data_key, PatientIndex(data))
+        st.session_state.patient_index = cached
+    return cached[1]
+
+def prepare_patient_view(data:pd.DataFrame, data_key=None, index=None):
     has_date = DATE_COL in data.columns
     has_patient = PATIENT_ID in data.columns
     selected_patient = "All"
+    if has_patient and (index is not None or data_key is not None):
+        # callers that maintain their own index (VisitBuffer) pass it in
+        index = index if index is not None else patient_index(data, data_key)
+        if len(index) > 0:
+            selected_patient = st.sidebar.selectbox("Select Patient",["All"]+index.patient_ids,index=0,key="selected_patient")
+        return index.view(selected_patient), has_date, has_patient
+
+    df = data.copy()
     if has_patient:
-          df[PATIENT_ID] = pd.to_numeric(df[PATIENT_ID], errors='coerce').astype("Int64")
+          if not pd.api.types.is_integer_dtype(df[PATIENT_ID]):
+              df[PATIENT_ID] = pd.to_numeric(df[PATIENT_ID], errors='coerce').astype("Int64")
           patient_ids = sorted(df[PATIENT_ID].dropna().unique().tolist())
           if len(patient_ids) > 0:
               selected_patient = st.sidebar.selectbox("Select Patient",["All"]+patient_ids,index=0,key="selected_patient")
           if selected_patient != "All":
               df=df[df[PATIENT_ID] == selected_patient].copy()
     if has_date:
-        df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors="coerce")
+        if not pd.api.types.is_datetime64_any_dtype(df[DATE_COL]):
+            df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors="coerce")
         df = df.sort_values(by=DATE_COL)
         
     if PATIENT_ID in df.columns and pd.api.types.is_datetime64_any_dtype(df[PATIENT_ID]):
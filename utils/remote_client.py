@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.getenv("ANEMIA_API_URL", "https://anemiaproject-production.up.railway.app/predict")
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class BatchRetry(Retry):
+    # /predict/batch commits before it answers, so a POST is only retried on answers that say nothing
+    # was stored: 429, or 503 with Retry-After (load shedding). Other 5xx and read timeouts may follow
+    # a commit and a retry would store the rows twice.
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method == "POST":
+            return bool(self.total) and (status_code == 429 or (status_code == 503 and has_retry_after))
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class RateLimiter:
+    def __init__(self, max_rps=None):
+        self.interval = 1.0 / max_rps if max_rps else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RemoteClient:
+    def __init__(self, api_url=API_URL, concurrency=4, max_rps=None, timeout=60, retries=3, backoff=0.5,
+                 admin_token=None):
+        self.batch_url = f"{api_url.rstrip('/')}/batch"
+        self.export_url = f"{api_url.rstrip('/').removesuffix('/predict')}/export"
+        self.summary_url = f"{api_url.rstrip('/').removesuffix('/predict')}/cohort/summary"
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = (5, timeout)
+        self.limiter = RateLimiter(max_rps)
+        # only sent to admin-guarded endpoints (/export)
+        self.admin_token = admin_token
+        # model version reported by the most recent /predict/batch response
+        self.model_version = None
+
+        retry = BatchRetry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            # POSTs are not retried on read errors; BatchRetry decides which POST statuses are safe
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post_batch(self, chunk):
+        self.limiter.wait()
+        r = self.session.post(self.batch_url, json=chunk, timeout=self.timeout)
+        if r.status_code != 200:
+            raise RuntimeError(f"Backend error {r.status_code}:{r.text}")
+        results = r.json().get("results", [])
+        if len(results) != len(chunk):
+            raise RuntimeError(f"Backend returned {len(results)} results for {len(chunk)} rows")
+        return [(res.get("probability", None), res.get("model_version", None)) for res in results]
+
+    def predict(self, payloads, batch_size=500):
+        chunks = [payloads[i:i + batch_size] for i in range(0, len(payloads), batch_size)]
+        errors = []
+
+        def run(chunk):
+            try:
+                return self.post_batch(chunk)
+            except Exception as e:
+                errors.append(str(e))
+                return [(None, None)] * len(chunk)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            # map() yields in submission order, so rows come back in their original order
+            scored = [r for chunk_results in pool.map(run, chunks) for r in chunk_results]
+        proba = [p for p, _ in scored]
+        versions = [v for _, v in scored]
+        seen = [v for v in versions if v]
+        if seen:
+            self.model_version = seen[-1]
+        return proba, versions, errors
+
+    def export_stream(self, **params):
+        # the caller reads response.raw incrementally and must close the response
+        params = {k: v for k, v in params.items() if v is not None}
+        headers = {"X-Admin-Token": self.admin_token} if self.admin_token else {}
+        r = self.session.get(self.export_url, params=params, headers=headers, stream=True, timeout=self.timeout)
+        if r.status_code != 200:
+            r.close()
+            raise RuntimeError(f"Backend error {r.status_code}:{r.text}")
+        r.raw.decode_content = True
+        return r
+
+    def cohort_summary(self, **params):
+        params = {k: v for k, v in params.items() if v is not None}
+        r = self.session.get(self.summary_url, params=params, timeout=self.timeout)
+        if r.status_code != 200:
+            raise RuntimeError(f"Backend error {r.status_code}:{r.text}")
+        return r.json().get("rows", [])
+
+    def close(self):
+        self.session.close()
+
+
+def client_from_env():
+    max_rps = os.getenv("REMOTE_MAX_RPS")
+    return RemoteClient(
+        api_url=API_URL,
+        concurrency=int(os.getenv("REMOTE_CONCURRENCY", "4")),
+        max_rps=float(max_rps) if max_rps else None,
+        timeout=float(os.getenv("REMOTE_TIMEOUT", "60")),
+        retries=int(os.getenv("REMOTE_RETRIES", "3")),
+        backoff=float(os.getenv("REMOTE_BACKOFF", "0.5")),
+        admin_token=os.getenv("ADMIN_TOKEN"),
+    )
@@ -1,19 +1,57 @@
+import numpy as np
+
+RISK_THRESHOLDS = {"high": 80, "moderate": 50, "low_hb": 11}
+
+RECOMMENDATIONS = {
+     "unavailable": "Prediction unavialable - backend error.",
+     "high": "🔴 High risk - consult a doctor soon.",
+     "moderate": "🟠 Moderate risk - repeat test & monitor diet.",
+     "low_hb": "🟡 Low hemoglobin - review iron intake.",
+     "stable": "🟢 Stable - continue monitoring.",
+}
+
+RISK_STYLES = {
+     "unavailable": "",
+     "high": "background-color:#d9534f; color:white; font-weight:bold",
+     "moderate": "background-color:#f0ad4e; color:black; font-weight:bold",
+     "low": "background-color:#5cb85c; color:white; font-weight:bold",
+}
+
+def _as_float(values):
+     values = np.atleast_1d(np.asarray(values))
+     if values.dtype == object:
+          # only object arrays need pandas' NA handling; the backend imports this module for RISK_THRESHOLDS
+          import pandas as pd
+          values = np.where(pd.isna(values), np.nan, values)
+     return values.astype(float)
+
+def recommendations(prob, hb):
+     prob, hb = _as_float(prob), _as_float(hb)
+     return np.select(
+          [np.isnan(prob), prob >= RISK_THRESHOLDS["high"], prob >= RISK_THRESHOLDS["moderate"], hb < RISK_THRESHOLDS["low_hb"]],
+          [RECOMMENDATIONS["unavailable"], RECOMMENDATIONS["high"], RECOMMENDATIONS["moderate"], RECOMMENDATIONS["low_hb"]],
+          default=RECOMMENDATIONS["stable"],
+     )
+
+def risk_styles(prob):
+     prob = _as_float(prob)
+     return np.select(
+          [np.isnan(prob), prob >= RISK_THRESHOLDS["high"], prob >= RISK_THRESHOLDS["moderate"]],
+          [RISK_STYLES["unavailable"], RISK_STYLES["high"], RISK_STYLES["moderate"]],
+          default=RISK_STYLES["low"],
+     )
+
 def get_recommendation(prob, hb):
-     if prob is None:
-          return "Prediction unavialable - backend error."
-     if prob >= 80:
-          return "🔴 High risk - consult a doctor soon."
-     elif prob >= 50:
-          return "🟠 Moderate risk - repeat test & monitor diet."
-     elif hb < 11:
-          return "🟡 Low hemoglobin - review iron intake."
-     else:
-          return "🟢 Stable - continue monitoring."    
+     return str(recommendations(prob, hb)[0])
+
+INSUFFICIENT_HISTORY = "Insufficient visit history to analyze trend."
 
 def trend_message(hb_series):
      if len(hb_series) < 3:
-          return "Insufficient visit history to analyze trend."
-     change = hb_series.iloc[-1] - hb_series.iloc[-3]
+          return INSUFFICIENT_HISTORY
+     return trend_text(hb_series.iloc[-1] - hb_series.iloc[-3])
+
+def trend_text(change):
      if change <= -1.0:
           return f"Hemoglobin dropped {abs(change):.1f} g/dL recently - worsening trend."
      elif change >= 1.0:
@@ -22,10 +60,4 @@ def trend_message(hb_series):
           return "Hemoglobin is relatively stable."      
 
 def color_risk(val):
-     if val is None:
-          return ""
-     if val >= 80:
-          return "background-color:#d9534f; color:white; font-weight:bold"
-     if val >= 50:
-          return "background-color:#f0ad4e; color:black; font-weight:bold"
-     return "background-color:#5cb85c; color:white; font-weight:bold"
+     return str(risk_styles(val)[0])
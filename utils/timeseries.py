@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from utils.risk import trend_text, INSUFFICIENT_HISTORY
+
+PATIENT_ID = "Patient_ID"
+DATE_COL = "Date"
+RISK_COL = "Risk Probability (%)"
+SMOOTHING_WINDOW = 3
+FORECAST_HORIZON_DAYS = 30
+HB_TREND_WEIGHT = 8.0
+TREND_DELTA = 1.0
+
+# Every function here assumes rows are sorted by (Patient_ID, Date) so each patient is one contiguous block.
+
+def is_sorted_by_visit(df:pd.DataFrame):
+    keys = df[PATIENT_ID]
+    if keys.hasnans or not keys.is_monotonic_increasing:
+        return False
+    if DATE_COL not in df.columns:
+        return True
+    k = keys.to_numpy()
+    d = df[DATE_COL].to_numpy()
+    same_patient = k[1:] == k[:-1]
+    return not bool(np.any(same_patient & (d[1:] < d[:-1])))
+
+def sort_visits(df:pd.DataFrame):
+    if is_sorted_by_visit(df):
+        return df
+    return df.sort_values([PATIENT_ID, DATE_COL], kind="mergesort")
+
+def group_starts(keys):
+    codes, _ = pd.factorize(keys, use_na_sentinel=False)
+    is_start = np.ones(len(codes), dtype=bool)
+    is_start[1:] = codes[1:] != codes[:-1]
+    # index of the first row of the block each row belongs to
+    return np.maximum.accumulate(np.where(is_start, np.arange(len(codes)), 0)), is_start
+
+def grouped_rolling_mean(values, keys, window=SMOOTHING_WINDOW):
+    v = np.asarray(values, dtype=float)
+    starts, _ = group_starts(keys)
+    valid = ~np.isnan(v)
+    total = np.concatenate([[0.0], np.cumsum(np.where(valid, v, 0.0))])
+    count = np.concatenate([[0], np.cumsum(valid)])
+    idx = np.arange(len(v))
+    lo = np.maximum(idx + 1 - window, starts)
+    n = count[idx + 1] - count[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (total[idx + 1] - total[lo]) / n, np.nan)
+
+def smooth_risk(results:pd.DataFrame, window=SMOOTHING_WINDOW):
+    return grouped_rolling_mean(results[RISK_COL].to_numpy(dtype=float, na_value=np.nan), results[PATIENT_ID], window)
+
+def _nth_from_end(df, from_end, n):
+    # row n-from-the-end of every patient, indexed by Patient_ID (missing when the patient has fewer visits)
+    return df[from_end == n].set_index(PATIENT_ID)
+
+def patient_summary(results:pd.DataFrame):
+    df = sort_visits(results)
+    df = df[df[PATIENT_ID].notna()]
+    from_end = df.groupby(PATIENT_ID, sort=False).cumcount(ascending=False).to_numpy()
+    last = _nth_from_end(df, from_end, 0)
+    third_last = _nth_from_end(df, from_end, 2)
+
+    summary = pd.DataFrame(index=last.index)
+    summary["Visits"] = df.groupby(PATIENT_ID, sort=False).size()
+    summary["Last Visit"] = last[DATE_COL]
+    summary["Hemoglobin"] = last["Hemoglobin"]
+    summary["Hb Change"] = last["Hemoglobin"] - third_last["Hemoglobin"].reindex(summary.index)
+    summary["Hb Slope"] = summary["Hb Change"] / 2
+    summary[RISK_COL] = last[RISK_COL].astype(float)
+
+    change = summary["Hb Change"].to_numpy()
+    has_history = summary["Visits"].to_numpy() >= 3
+    summary["Trend"] = np.select(
+        [~has_history, change <= -TREND_DELTA, change >= TREND_DELTA],
+        ["insufficient", "worsening", "improving"],
+        default="stable",
+    )
+    summary["Trend Message"] = [trend_text(c) if h else INSUFFICIENT_HISTORY for c, h in zip(change, has_history)]
+
+    forecast = np.clip(summary[RISK_COL].to_numpy() - summary["Hb Slope"].to_numpy() * HB_TREND_WEIGHT, 5.0, 95.0)
+    summary["Forecast Risk (%)"] = np.where(has_history, np.round(forecast, 2), np.nan)
+    summary["Forecast Date"] = summary["Last Visit"] + pd.to_timedelta(FORECAST_HORIZON_DAYS, unit="d")
+    summary.loc[~has_history, "Forecast Date"] = pd.NaT
+    return summary.reset_index()
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from utils.ingest import clean_chunk
+from utils.patient_index import PatientIndex
+
+COLUMNS = {
+    "Patient_ID": "int32",
+    "Date": "datetime64[ns]",
+    "Gender": "int8",
+    "Hemoglobin": "float32",
+    "MCH": "float32",
+    "MCHC": "float32",
+    "MCV": "float32",
+}
+
+
+class VisitBuffer:
+    # Typed, growable column arrays for Manual Entry. Appends are amortized O(1), frames are
+    # read-only views over the filled part and the patient index is extended, not rebuilt.
+    def __init__(self, capacity=64):
+        self.columns = {c: np.empty(capacity, dtype=t) for c, t in COLUMNS.items()}
+        self.size = 0
+        self.version = 0
+        self._frame = None
+        self._index = None
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self.columns["Patient_ID"])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for c, arr in self.columns.items():
+            grown = np.empty(capacity, dtype=arr.dtype)
+            grown[:self.size] = arr[:self.size]
+            self.columns[c] = grown
+
+    def _changed(self):
+        self.version += 1
+        self._frame = None
+
+    def append(self, Patient_ID, Date, Gender, Hemoglobin, MCH, MCHC, MCV):
+        self._reserve(1)
+        row = {"Patient_ID": Patient_ID, "Date": np.datetime64(pd.Timestamp(Date), "ns"), "Gender": Gender,
+               "Hemoglobin": Hemoglobin, "MCH": MCH, "MCHC": MCHC, "MCV": MCV}
+        for c, v in row.items():
+            self.columns[c][self.size] = v
+        self.size += 1
+        self._changed()
+
+    def extend(self, df: pd.DataFrame):
+        clean, bad_rows = clean_chunk(df)
+        missing = [c for c in COLUMNS if c not in clean.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+        # clean_chunk keeps blank IDs and genders as nullable ints, but the buffer's int arrays need a value
+        blank = clean[["Patient_ID", "Gender"]].isna()
+        if blank.any(axis=None):
+            rows = blank.any(axis=1).to_numpy()
+            reasons = (blank["Patient_ID"].map({True: "missing Patient_ID; ", False: ""})
+                       + blank["Gender"].map({True: "missing Gender; ", False: ""}))
+            skipped = pd.DataFrame({"row": df.index.get_indexer(clean.index[rows]) + 1,
+                                    "reason": reasons[rows].str.rstrip("; ").to_numpy()})
+            bad_rows = pd.concat([bad_rows, skipped], ignore_index=True).sort_values("row", ignore_index=True)
+            clean = clean[~rows]
+        n = len(clean)
+        if n:
+            self._reserve(n)
+            for c, t in COLUMNS.items():
+                self.columns[c][self.size:self.size + n] = clean[c].to_numpy(dtype=t)
+            self.size += n
+            self._changed()
+        return n, bad_rows
+
+    def to_frame(self):
+        # rows are only ever appended past size, so a view taken now never changes under the caller;
+        # growing reallocates and leaves older views on the old arrays
+        if self._frame is None:
+            views = {}
+            for c, arr in self.columns.items():
+                views[c] = arr[:self.size]
+                views[c].flags.writeable = False
+            self._frame = pd.DataFrame(views, copy=False)
+        return self._frame
+
+    def patient_index(self):
+        frame = self.to_frame()
+        if self._index is None:
+            self._index = PatientIndex(frame)
+        elif self._index.size != len(frame):
+            self._index.extend(frame)
+        return self._index